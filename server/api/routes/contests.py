@@ -0,0 +1,27 @@
+from fastapi import APIRouter, Query
+from datetime import datetime, timezone
+from services.contests import ContestService
+
+router = APIRouter()
+MAX_RANGE_RESULTS = 1000
+
+def to_epoch(value: datetime):
+    if value is None:
+        return None
+    # Naive datetimes are taken as UTC
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+@router.get("/")
+async def get_contests(
+    from_: datetime = Query(None, alias="from"),
+    to: datetime = Query(None),
+    platform: str = Query(None),
+    limit: int = Query(100, ge=1, le=MAX_RANGE_RESULTS)
+):
+    """
+    Stored contests (upcoming and past) starting between `from` and `to`, oldest
+    first. Both bounds take an ISO date/datetime or a unix timestamp.
+    """
+    return await ContestService.get_range(to_epoch(from_), to_epoch(to), platform, limit)
@@ -1,52 +1,20 @@
 from fastapi import APIRouter, Depends
-from database import db
+from services.summary import DashboardSummary, DEFAULT_DEPARTMENTS
 
 router = APIRouter()
 
 @router.get("/stats")
 async def get_dashboard_stats():
-    students = list(db.get_db()["students"].find())
+    # Served from the materialized summary document, not a scan of every student
+    summary = await DashboardSummary.get()
     
-    total_students = len(students)
-    total_solved = 0
-    department_counts = {}
     # Initialize default departments
-    default_depts = ["CSE", "ECE", "IT", "AI"]
-    dept_aggregated = {d: {"count": 0, "solved": 0} for d in default_depts}
-    
-    skill_dist = {"expert": 0, "intermediate": 0, "beginner": 0}
-    zero_solvers = 0
-    
-    for s in students:
-        stats = s.get("stats", {})
-        
-        # Aggregate Solved Count
-        lc = stats.get("leetcode", {}).get("total_solved", 0)
-        cc = stats.get("codechef", {}).get("solved", 0)
-        cf = stats.get("codeforces", {}).get("solved", 0)
-        hr = stats.get("hackerrank", {}).get("solved", 0)
-        
-        student_total = lc + cc + cf + hr
-        total_solved += student_total
-        
-        # Skill categorization
-        if student_total > 500:
-            skill_dist["expert"] += 1
-        elif student_total > 200:
-            skill_dist["intermediate"] += 1
-        else:
-            skill_dist["beginner"] += 1
-            
-        if student_total == 0:
-            zero_solvers += 1
-        
-        dept = s.get("department", "Unknown")
-        department_counts[dept] = department_counts.get(dept, 0) + 1
-        
-        if dept not in dept_aggregated:
-            dept_aggregated[dept] = {"count": 0, "solved": 0}
-        dept_aggregated[dept]["count"] += 1
-        dept_aggregated[dept]["solved"] += student_total
+    dept_aggregated = {d: {"count": 0, "solved": 0} for d in DEFAULT_DEPARTMENTS}
+    for dept, data in summary.get("departments", {}).items():
+        if data.get("count", 0) > 0 or dept in dept_aggregated:
+            dept_aggregated[dept] = {"count": data.get("count", 0), "solved": data.get("solved", 0)}
+
+    department_counts = {dept: data["count"] for dept, data in dept_aggregated.items() if data["count"] > 0}
 
     department_stats = []
     for dept, data in dept_aggregated.items():
@@ -58,19 +26,39 @@ async def get_dashboard_stats():
             "avg_solved": int(avg)
         })
 
+    skill = summary.get("skill", {})
     return {
-        "total_students": total_students,
-        "total_solved": total_solved,
+        "total_students": summary.get("total_students", 0),
+        "total_solved": summary.get("total_solved", 0),
         "department_counts": department_counts,
         "department_stats": department_stats,
-        "skill_distribution": skill_dist,
-        "inactive_students": zero_solvers,
+        "skill_distribution": {
+            "expert": skill.get("expert", 0),
+            "intermediate": skill.get("intermediate", 0),
+            "beginner": skill.get("beginner", 0)
+        },
+        "inactive_students": summary.get("inactive", 0),
         "active_contests": 2
     }
 from services.contests import ContestService
+from services.cache import response_cache
 
 @router.get("/contests")
 async def get_upcoming_contests():
     return await ContestService.get_upcoming()
 
+@router.get("/cache-stats")
+async def get_cache_stats():
+    return response_cache.stats()
+
+from services.executors import executors, loop_lag
+
+@router.get("/loop-lag")
+async def get_loop_lag(reset: bool = False):
+    """Event-loop lag of the API process, plus executor usage. `reset=true` starts a new window."""
+    stats = {"loop": loop_lag.stats(), "executors": executors.stats()}
+    if reset:
+        loop_lag.reset()
+    return stats
+
 # End of file
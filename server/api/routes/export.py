@@ -1,6 +1,6 @@
 from fastapi import APIRouter, Query
 from fastapi.responses import StreamingResponse
-from services.export import ExportService
+from services.export import ExportService, ExportRenderer, EXPORT_FORMATS
 from datetime import datetime
 
 router = APIRouter()
@@ -11,22 +11,31 @@ async def download_report(
     year: int = Query(None),
     platform: str = Query(None),
     contest_name: str = Query(None),
-    contest_date: str = Query(None)
+    contest_date: str = Query(None),
+    format: str = Query("xlsx", pattern="^(xlsx|csv|parquet|ndjson)$")
 ):
     try:
-        excel_file = await ExportService.generate_excel(department, year, platform, contest_name, contest_date)
-        
-        filename = f"Performance_Report_{datetime.now().strftime('%Y%m%d')}.xlsx"
+        extension, media_type = EXPORT_FORMATS[format]
+        filename = f"Performance_Report_{datetime.now().strftime('%Y%m%d')}.{extension}"
         
         headers = {
             'Content-Disposition': f'attachment; filename="{filename}"'
         }
-        
-        return StreamingResponse(
-            excel_file, 
-            headers=headers, 
-            media_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-        )
+
+        if format == "xlsx":
+            excel_path = await ExportRenderer.generate_excel(department, year, platform, contest_name, contest_date)
+            # The rendered file is sent in chunks and deleted once fully sent
+            return StreamingResponse(ExportRenderer.iter_file(excel_path), headers=headers, media_type=media_type)
+
+        # Flat formats: one sheet's worth of rows (wide per-student rows for the performance report)
+        columns, records = await ExportService.report_records(department, year, platform, contest_name)
+        if format == "csv":
+            content = ExportRenderer.stream_csv(columns, records)
+        elif format == "ndjson":
+            content = ExportRenderer.stream_ndjson(records)
+        else:
+            content = ExportRenderer.iter_file(await ExportRenderer.generate_parquet(columns, records))
+        return StreamingResponse(content, headers=headers, media_type=media_type)
     except Exception as e:
         import traceback
         traceback.print_exc()
@@ -1,11 +1,39 @@
-from fastapi import APIRouter, HTTPException, Body
+from fastapi import APIRouter, HTTPException, Body, Query, Response
+from fastapi.responses import StreamingResponse
 from models.student import Student, StudentCreate
 from services.aggregator import PlatformAggregator
+from services.history import RatingHistory
+from services.refresh import RefreshEngine, update_single_student
+from services.student_store import StudentStore
 from database import db
 from typing import List
+import json
+import re
 
 router = APIRouter()
 
+# Always projected so responses still validate against the Student model
+BASE_FIELDS = ["reg_no", "name", "department", "year", "handles"]
+MAX_PAGE_SIZE = 1000
+FIELD_PATTERN = re.compile(r"^[A-Za-z_]\w*(\.\w+)*$")
+
+def projection_for(fields: str):
+    """
+    Turns a comma-separated field list (e.g. "total_solved,stats.leetcode.rating")
+    into a Mongo projection. No list means the whole document.
+    """
+    if not fields:
+        return None
+    requested = [f.strip() for f in fields.split(",") if f.strip()]
+    invalid = [f for f in requested if not FIELD_PATTERN.match(f)]
+    if invalid:
+        raise HTTPException(status_code=400, detail=f"Invalid fields: {', '.join(invalid)}")
+
+    paths = list(dict.fromkeys(BASE_FIELDS + requested))
+    # Mongo rejects a projection that names both a path and one of its parents
+    paths = [p for p in paths if not any(p.startswith(other + ".") for other in paths)]
+    return {p: 1 for p in paths}
+
 @router.post("/verify-profiles")
 async def verify_student_profiles(handles: dict = Body(...)):
     """
@@ -18,24 +46,26 @@ async def verify_student_profiles(handles: dict = Body(...)):
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/{reg_no}", response_model=Student)
-async def get_student(reg_no: str):
-    student = db.get_db()["students"].find_one({"reg_no": reg_no})
+async def get_student(reg_no: str, fields: str = Query(None), history: bool = Query(False)):
+    student = await db.get_async_db()["students"].find_one({"reg_no": reg_no}, projection_for(fields))
     if not student:
         raise HTTPException(status_code=404, detail="Student not found")
+    if history:
+        await RatingHistory.attach(student)
     if "_id" in student: student["_id"] = str(student["_id"])
     return student
 
 @router.delete("/{reg_no}", status_code=204)
 async def delete_student(reg_no: str):
-    result = db.get_db()["students"].delete_one({"reg_no": reg_no})
-    if result.deleted_count == 0:
+    deleted = await StudentStore.delete(reg_no)
+    if not deleted:
         raise HTTPException(status_code=404, detail="Student not found")
     return None
 
 @router.put("/{reg_no}", response_model=Student)
 async def update_student(reg_no: str, student_update: StudentCreate):
     # Check if student exists
-    existing = db.get_db()["students"].find_one({"reg_no": reg_no})
+    existing = await db.get_async_db()["students"].find_one({"reg_no": reg_no})
     if not existing:
         raise HTTPException(status_code=404, detail="Student not found")
 
@@ -54,31 +84,21 @@ async def update_student(reg_no: str, student_update: StudentCreate):
          stats = await PlatformAggregator.verify_profile(student_update.handles.dict())
          update_data["stats"] = stats
 
-    db.get_db()["students"].update_one(
-        {"reg_no": reg_no},
-        {"$set": update_data}
-    )
+    await StudentStore.update(existing, update_data)
     
-    updated_student = db.get_db()["students"].find_one({"reg_no": reg_no})
+    updated_student = await db.get_async_db()["students"].find_one({"reg_no": reg_no})
     return fix_id(updated_student)
 
 @router.post("/{reg_no}/refresh", response_model=Student)
 async def refresh_student_stats(reg_no: str):
-    student = db.get_db()["students"].find_one({"reg_no": reg_no})
+    student = await db.get_async_db()["students"].find_one({"reg_no": reg_no})
     if not student:
         raise HTTPException(status_code=404, detail="Student not found")
         
-    handles = student.get("handles", {})
-    # Re-verify/fetch stats
-    new_stats = await PlatformAggregator.verify_profile(handles)
-    
-    # Update DB
-    db.get_db()["students"].update_one(
-        {"reg_no": reg_no},
-        {"$set": {"stats": new_stats}}
-    )
+    # Same path as the scheduled refresh: only changed platforms are written
+    await update_single_student(student)
     
-    updated_student = db.get_db()["students"].find_one({"reg_no": reg_no})
+    updated_student = await db.get_async_db()["students"].find_one({"reg_no": reg_no})
     return fix_id(updated_student)
 
 def fix_id(doc):
@@ -91,7 +111,7 @@ async def create_student(student: StudentCreate):
     student_dict = student.dict(by_alias=True)
     
     # Check for duplicates
-    existing = db.get_db()["students"].find_one({"reg_no": student.reg_no})
+    existing = await db.get_async_db()["students"].find_one({"reg_no": student.reg_no})
     if existing:
         raise HTTPException(status_code=400, detail="Student with this Register Number already exists")
 
@@ -99,50 +119,79 @@ async def create_student(student: StudentCreate):
     stats = await PlatformAggregator.verify_profile(student.handles.dict())
     student_dict["stats"] = stats
     
-    new_student = db.get_db()["students"].insert_one(student_dict)
-    created_student = db.get_db()["students"].find_one({"_id": new_student.inserted_id})
+    new_student_id = await StudentStore.create(student_dict)
+    created_student = await db.get_async_db()["students"].find_one({"_id": new_student_id})
     return fix_id(created_student)
 
 @router.get("/", response_model=List[Student])
-async def get_students(department: str = None):
+async def get_students(
+    response: Response,
+    department: str = None,
+    year: int = Query(None),
+    min_solved: int = Query(None, ge=0),
+    limit: int = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str = Query(None),
+    order: str = Query("asc", pattern="^(asc|desc)$"),
+    fields: str = Query(None),
+    format: str = Query("json", pattern="^(json|ndjson)$")
+):
+    """
+    Lists students ordered by reg_no, with keyset pagination.
+
+    Pass `limit` to page; when more results exist the response carries an
+    `X-Next-Cursor` header to send back as `cursor`. Without `limit` the full
+    (filtered) list is returned as before. `format=ndjson` streams one JSON
+    document per line without building response models.
+    """
     query = {}
     if department:
         query["department"] = department
-    students = list(db.get_db()["students"].find(query))
+    if year is not None:
+        query["year"] = year
+    if min_solved is not None:
+        query["total_solved"] = {"$gte": min_solved}
+    if cursor:
+        query["reg_no"] = {"$gt" if order == "asc" else "$lt": cursor}
+
+    direction = 1 if order == "asc" else -1
+    students_cursor = db.get_async_db()["students"].find(query, projection_for(fields)).sort("reg_no", direction)
+    if limit:
+        # One extra document tells us whether there is a next page
+        students_cursor = students_cursor.limit(limit + 1)
+
+    if format == "ndjson":
+        return StreamingResponse(stream_ndjson(students_cursor, limit), media_type="application/x-ndjson")
+
+    students = await students_cursor.to_list()
+    if limit and len(students) > limit:
+        students = students[:limit]
+        response.headers["X-Next-Cursor"] = students[-1]["reg_no"]
     return [fix_id(s) for s in students]
 
+async def stream_ndjson(students_cursor, limit: int = None):
+    sent = 0
+    last_reg_no = None
+    async for student in students_cursor:
+        if limit and sent == limit:
+            # Same continuation as the X-Next-Cursor header, as a trailing line
+            yield json.dumps({"next_cursor": last_reg_no}) + "\n"
+            break
+        last_reg_no = student.get("reg_no")
+        sent += 1
+        yield json.dumps(fix_id(student), default=str) + "\n"
+
 
 @router.post("/refresh-department")
 async def refresh_department_stats(department: str):
     """
     Refreshes stats for all students in the given department.
     """
-    students = list(db.get_db()["students"].find({"department": department}))
+    students = await db.get_async_db()["students"].find({"department": department}).to_list()
     if not students:
         raise HTTPException(status_code=404, detail="No students found in this department")
     
-    updated_count = 0
-    
-    # Process sequentially to avoid rate limits (or use a semaphore if we want parallelism)
-    for student in students:
-        reg_no = student.get("reg_no")
-        handles = student.get("handles", {})
-        
-        if not handles:
-            continue
-            
-        try:
-            # Re-verify/fetch stats
-            new_stats = await PlatformAggregator.verify_profile(handles)
-            
-            if new_stats:
-                db.get_db()["students"].update_one(
-                    {"reg_no": reg_no},
-                    {"$set": {"stats": new_stats}}
-                )
-                updated_count += 1
-        except Exception as e:
-            print(f"Failed to refresh student {reg_no}: {e}")
-            continue
-            
+    # Goes through the same rate-limited, bounded-concurrency engine as the scheduled sync
+    with_handles = [s for s in students if s.get("handles")]
+    updated_count = await RefreshEngine.refresh_students(with_handles)
+
     return {"message": f"Refreshed stats for {updated_count} students", "total": len(students)}
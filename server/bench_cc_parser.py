@@ -0,0 +1,111 @@
+"""
+Compares the fragment-based CodeChef profile parser with the previous
+BeautifulSoup one on a saved profile page.
+
+    python bench_cc_parser.py [fixture.html] [iterations]
+"""
+import json
+import os
+import re
+import sys
+import time
+from bs4 import BeautifulSoup
+from services.platforms.codechef import parse_profile
+
+FIXTURE = os.path.join(os.path.dirname(__file__), "fixtures", "codechef_profile.html")
+
+def parse_profile_bs4(html: str) -> dict:
+    """The parser CodeChefService used before, kept here as the baseline."""
+    soup = BeautifulSoup(html, "html.parser")
+    text_content = soup.get_text()
+
+    rating_val = 0
+    rating_header = soup.find("div", class_="rating-header")
+    if rating_header:
+        rating_tag = rating_header.find("div", class_="rating-number")
+        if rating_tag:
+            # The old code read the whole tag text; the fixture adds a "?" info span, so keep digits only
+            rating_val = int(re.match(r"\s*(\d+)", rating_tag.text).group(1))
+
+    stars = 0
+    star_tag = soup.find("span", class_="rating")
+    if star_tag and "★" in star_tag.text:
+        stars_text = star_tag.text.replace("★", "").strip()
+        if stars_text.isdigit():
+            stars = int(stars_text)
+
+    global_rank = 0
+    ranks = soup.find("div", class_="rating-ranks")
+    if ranks:
+        global_rank_tag = ranks.find("a", href=lambda x: x and "global" in x)
+        if global_rank_tag:
+            global_rank = int(global_rank_tag.text.strip())
+
+    max_rating = 0
+    max_rating_header = soup.find("div", class_="rating-header")
+    if max_rating_header:
+        small_tag = max_rating_header.find("small")
+        if small_tag:
+            match_max = re.search(r"Highest Rating (\d+)", small_tag.text)
+            if match_max:
+                max_rating = int(match_max.group(1))
+
+    country_rank = 0
+    ranks = soup.find("div", class_="rating-ranks")
+    if ranks:
+        country_rank_tag = ranks.find("a", href=lambda x: x and "country" in x)
+        if country_rank_tag:
+            country_rank = int(country_rank_tag.text.strip())
+
+    solved = 0
+    match_solved = re.search(r"Total Problems Solved:?\s*(\d+)", text_content, re.IGNORECASE)
+    if match_solved:
+        solved = int(match_solved.group(1))
+
+    contests = 0
+    match_contest = re.search(r"No\.? of Contests Participated:?\s*(\d+)", text_content, re.IGNORECASE)
+    if not match_contest:
+        match_contest = re.search(r"Contests Participated:?\s*(\d+)", text_content, re.IGNORECASE)
+    if match_contest:
+        contests = int(match_contest.group(1))
+
+    history = []
+    match_history = re.search(r"var all_rating = (\[.*?\]);", html, re.DOTALL)
+    if match_history:
+        history = json.loads(match_history.group(1))
+
+    return {
+        "rating": rating_val,
+        "stars": stars,
+        "global_rank": global_rank,
+        "country_rank": country_rank,
+        "max_rating": max_rating,
+        "solved": solved,
+        "contests": contests,
+        "history": history,
+    }
+
+def bench(parser, html: str, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        parser(html)
+    return (time.perf_counter() - start) / iterations * 1000
+
+if __name__ == "__main__":
+    path = sys.argv[1] if len(sys.argv) > 1 else FIXTURE
+    iterations = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    with open(path, encoding="utf-8") as f:
+        html = f.read()
+
+    fast, legacy = parse_profile(html), parse_profile_bs4(html)
+    for field in legacy:
+        status = "ok" if fast[field] == legacy[field] else "MISMATCH"
+        shown = f"{len(fast[field])} entries" if field == "history" else fast[field]
+        print(f"{field:>13}: {shown} [{status}]")
+
+    print(f"\n{os.path.basename(path)}: {len(html) / 1024:.0f} KB, {iterations} iterations")
+    legacy_ms = bench(parse_profile_bs4, html, iterations)
+    fast_ms = bench(parse_profile, html, iterations)
+    print(f"BeautifulSoup: {legacy_ms:8.2f} ms/page")
+    print(f"fragments:     {fast_ms:8.2f} ms/page  ({legacy_ms / fast_ms:.0f}x faster)")
+    sys.exit(0 if fast == legacy else 1)
@@ -1,4 +1,5 @@
-from pymongo import MongoClient
+import asyncio
+from pymongo import AsyncMongoClient, MongoClient
 from pymongo.server_api import ServerApi
 import os
 from dotenv import load_dotenv
@@ -11,6 +12,11 @@ DB_NAME = "contest_tracker"
 class Database:
     client: MongoClient = None
 
+    def __init__(self):
+        # Async clients are bound to the event loop they first run on. The API and
+        # the scheduler's asyncio.run each get their own; see get_async_db().
+        self._async_clients = {}
+
     def connect(self):
         # Use ServerApi for Atlas
         # Adding timeouts and potential fix for DNS issues
@@ -22,8 +28,24 @@ class Database:
             print(f"MongoDB Connection Error: {e}")
 
     def get_db(self):
+        """Blocking client, for startup tasks and the scheduler thread."""
         return self.client[DB_NAME]
 
+    def get_async_db(self):
+        """Non-blocking client for coroutines; must be called from inside a running event loop."""
+        loop = asyncio.get_running_loop()
+        client = self._async_clients.get(loop)
+        if client is None:
+            client = AsyncMongoClient(MONGO_URI, server_api=ServerApi('1'), serverSelectionTimeoutMS=5000)
+            self._async_clients[loop] = client
+        return client[DB_NAME]
+
+    async def close_async(self):
+        """Closes the async client owned by the current event loop."""
+        client = self._async_clients.pop(asyncio.get_running_loop(), None)
+        if client:
+            await client.close()
+
     def close(self):
         if self.client:
             self.client.close()
@@ -0,0 +1,149 @@
+import os
+import sys
+from database import db
+
+# Indexes the app's queries depend on: collection -> [(keys, options)]
+INDEXES = {
+    "students": [
+        ([("reg_no", 1)], {"unique": True}),
+        # Also serves the reg_no-ordered keyset pages of the student listing
+        ([("department", 1), ("year", 1), ("reg_no", 1)], {}),
+        # Department-wide exports and listings (year "All") in reg_no order
+        ([("department", 1), ("reg_no", 1)], {}),
+        ([("year", 1)], {}),
+        ([("total_solved", 1)], {}),
+        ([("handles.codeforces", 1)], {}),
+    ],
+    "contest_performance": [
+        ([("reg_no", 1), ("platform", 1), ("contest_name", 1)], {"unique": True}),
+    ],
+    "rating_history": [
+        ([("reg_no", 1), ("platform", 1)], {"unique": True}),
+    ],
+    "performance_snapshots": [
+        # Also the date/reg_no order the report workbook is rendered in
+        ([("report", 1), ("date", 1), ("reg_no", 1)], {}),
+        ([("report", 1), ("stored_at", -1)], {}),
+    ],
+    "contests": [
+        ([("id", 1)], {"unique": True}),
+        ([("start_time", 1)], {}),
+        ([("platform", 1), ("start_time", 1)], {}),
+        # Case-insensitive, matching ContestService.resolve()
+        ([("platform", 1), ("code", 1)], {"collation": {"locale": "en", "strength": 2}}),
+        ([("platform", 1), ("name", 1)], {"collation": {"locale": "en", "strength": 2}}),
+    ],
+    "contest_results": [
+        ([("platform", 1), ("reg_no", 1), ("key", 1), ("code", 1)], {"unique": True}),
+        ([("platform", 1), ("key", 1), ("reg_no", 1)], {}),
+        ([("platform", 1), ("code", 1), ("reg_no", 1)], {}),
+        ([("platform", 1), ("parent", 1), ("reg_no", 1)], {}),
+        ([("reg_no", 1)], {}),
+    ],
+    "refresh_jobs": [
+        # JobQueue.lease(): due queued jobs, and running jobs whose lease has expired
+        ([("status", 1), ("run_after", 1), ("priority", 1)], {}),
+        ([("status", 1), ("lease_until", 1)], {}),
+        ([("run_id", 1), ("status", 1)], {}),
+        # Finished jobs are kept a week for inspection
+        ([("finished_at", 1)], {"expireAfterSeconds": 7 * 24 * 3600}),
+    ],
+    "refresh_plan": [
+        ([("reg_no", 1), ("platform", 1)], {"unique": True}),
+        # RefreshPlan.take_due(): most overdue first
+        ([("next_due", 1)], {}),
+        # RefreshPlan.release(): pairs waiting on a run
+        ([("queued_run", 1)], {"sparse": True}),
+    ],
+    "http_cache": [
+        ([("purge_at", 1)], {"expireAfterSeconds": 0}),
+    ],
+}
+
+# Representative filters issued by the routes and services, checked by explain_queries(),
+# with the sort they run with where they have one.
+# Full-collection reads (e.g. the scheduled sync loading every student) are left out on purpose.
+APP_QUERIES = [
+    ("students", {"reg_no": "21CS101"}),
+    ("students", {"department": "CSE"}),
+    ("students", {"department": "CSE", "year": 3}),
+    ("students", {"year": 3}),
+    ("students", {"handles.codeforces": {"$exists": True, "$ne": ""}}),
+    # ExportService.students_cursor()
+    ("students", {"department": "CSE", "year": 3}, [("reg_no", 1)]),
+    ("students", {"department": "CSE"}, [("reg_no", 1)]),
+    # PerformanceSnapshots.render()
+    ("performance_snapshots", {"report": "CSE_3"}, [("date", 1), ("reg_no", 1)]),
+    ("contests", {"start_time": {"$gte": 1700000000, "$lt": 1800000000}}),
+    ("contests", {"platform": "Codeforces", "start_time": {"$gte": 1700000000}}),
+    # ContestService.resolve() loose match
+    ("contests", {"platform": "LeetCode", "name": {"$regex": "w[\\s\\-_.]*e", "$options": "i"}}, [("start_time", -1)]),
+    ("contest_results", {"platform": "leetcode", "reg_no": {"$in": ["21CS101"]}, "$or": [{"code": "weekly-contest-400"}, {"parent": "weekly-contest-400"}, {"key": "weeklycontest400"}]}),
+    ("refresh_jobs", {"run_id": "0f3a", "status": {"$in": ["queued", "running"]}}),
+    ("refresh_plan", {"reg_no": "21CS101", "platform": {"$in": ["codeforces", "leetcode"]}}),
+    ("contest_performance", {"reg_no": "21CS101", "platform": "LeetCode", "contest_name": "Weekly Contest 1"}),
+]
+
+EXPLAIN_ON_STARTUP = os.getenv("MONGO_EXPLAIN_ON_STARTUP", "0") == "1"
+
+
+def ensure_indexes():
+    """Creates every declared index. create_index is a no-op for indexes that already exist."""
+    database = db.get_db()
+    for collection, specs in INDEXES.items():
+        for keys, options in specs:
+            try:
+                database[collection].create_index(keys, **options)
+            except Exception as e:
+                print(f"Index creation error on {collection} {keys}: {e}")
+                if options.get("unique"):
+                    print(f"  -> {collection} probably holds duplicate {[k for k, _ in keys]} values; dedupe them and restart.")
+
+
+def _plan_stages(plan: dict):
+    yield plan.get("stage")
+    for child in plan.get("inputStages", []) + ([plan["inputStage"]] if "inputStage" in plan else []):
+        yield from _plan_stages(child)
+    if "queryPlan" in plan:
+        yield from _plan_stages(plan["queryPlan"])
+
+
+def explain_queries():
+    """
+    Runs explain() on APP_QUERIES and reports the winning plan of each.
+    Returns the queries that fell back to a COLLSCAN or sort in memory.
+    """
+    database = db.get_db()
+    collscans = []
+    for collection, query, *sort in APP_QUERIES:
+        cursor = database[collection].find(query)
+        if sort:
+            cursor = cursor.sort(sort[0])
+        try:
+            plan = cursor.explain()["queryPlanner"]["winningPlan"]
+        except Exception as e:
+            print(f"[explain] {collection} {query}: error {e}")
+            continue
+
+        stages = [s for s in _plan_stages(plan) if s]
+        if "COLLSCAN" in stages:
+            collscans.append((collection, query))
+            print(f"[explain] COLLSCAN  {collection} {query}")
+        elif "SORT" in stages:
+            collscans.append((collection, query))
+            print(f"[explain] SORT      {collection} {query} sorted in memory by {sort[0]}")
+        else:
+            print(f"[explain] ok        {collection} {query} -> {' <- '.join(stages)}")
+
+    if collscans:
+        print(f"[explain] {len(collscans)} queries scan a whole collection or sort in memory; check INDEXES in indexes.py")
+    return collscans
+
+
+if __name__ == "__main__":
+    # python indexes.py            -> create indexes
+    # python indexes.py --explain  -> create indexes, then report query plans
+    db.connect()
+    ensure_indexes()
+    if "--explain" in sys.argv:
+        sys.exit(1 if explain_queries() else 0)
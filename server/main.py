@@ -29,24 +29,55 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
-from api.routes import students, export, dashboard
+from api.routes import students, export, dashboard, contests
 from auth import routes as auth_routes
 from services.scheduler import start_scheduler, shutdown_scheduler
 from database import db
+from indexes import ensure_indexes, explain_queries, EXPLAIN_ON_STARTUP
+from services.http_client import http_clients
+from services.cache import response_cache
+from services.history import RatingHistory
+from services.contest_results import ContestResults
+from services.contests import contest_calendar
+from services.executors import executors, loop_lag
+from services.jobs import RefreshWorker, EMBEDDED_WORKER
+
+# Refresh worker inside the API process; more run standalone with `python worker.py`
+embedded_worker = RefreshWorker() if EMBEDDED_WORKER else None
 
 app.include_router(auth_routes.router, prefix="/api", tags=["Authentication"])
 app.include_router(dashboard.router, prefix="/api/dashboard", tags=["Dashboard"])
 app.include_router(students.router, prefix="/api/students", tags=["Students"])
 app.include_router(export.router, prefix="/api/export", tags=["Export"])
+app.include_router(contests.router, prefix="/api/contests", tags=["Contests"])
 
 @app.on_event("startup")
-def startup():
+async def startup():
     db.connect()
+    ensure_indexes()
+    if EXPLAIN_ON_STARTUP:
+        explain_queries()
+    response_cache.setup()
+    await RatingHistory.migrate_embedded()
+    await ContestResults.backfill()
+    loop_lag.start()
+    await http_clients.start()
+    contest_calendar.start()
+    if embedded_worker:
+        embedded_worker.start()
     start_scheduler()
 
 @app.on_event("shutdown")
-def shutdown():
+async def shutdown():
+    await contest_calendar.stop()
+    if embedded_worker:
+        await embedded_worker.stop()
+    await http_clients.close()
+    await db.close_async()
     db.close()
     shutdown_scheduler()
+    await loop_lag.stop()
+    executors.shutdown()
@@ -22,8 +22,12 @@ class Student(StudentBase):
     id: Optional[str] = Field(None, alias="_id")
     created_at: datetime = Field(default_factory=datetime.utcnow)
     
-    # Aggregated stats (updated periodically)
+    # Aggregated stats (updated periodically); rating histories are stored separately
     stats: Optional[Dict] = {} 
+    total_solved: Optional[int] = None
+    # Time of the last refresh, and of the last one that actually changed the stats
+    last_updated: Optional[datetime] = None
+    last_changed: Optional[datetime] = None
 
     class Config:
         populate_by_name = True
@@ -6,18 +6,83 @@ import asyncio
 
 class PlatformAggregator:
     @staticmethod
-    async def verify_profile(handles: dict):
+    async def prefetch(students: list, platforms: dict = None):
+        """
+        Fetches whatever the platforms can serve in bulk for a whole cohort, so the
+        per-student refreshes that follow only make the calls that can't be batched.
+        `platforms` optionally limits each reg_no to the platforms being refreshed.
+        """
+        prefetched = {}
+
+        def handles_for(platform):
+            return [
+                s["handles"][platform] for s in students
+                if (s.get("handles") or {}).get(platform)
+                and (platforms is None or platform in platforms.get(s["reg_no"], ()))
+            ]
+
+        cf_handles = handles_for("codeforces")
+        if cf_handles:
+            cf_infos = await CodeforcesService.get_user_infos(cf_handles)
+            if cf_infos is not None:
+                prefetched["codeforces"] = cf_infos
+
+        lc_handles = handles_for("leetcode")
+        if lc_handles:
+            prefetched["leetcode"] = await LeetCodeService.get_user_profiles(lc_handles)
+
+        return prefetched
+
+    @staticmethod
+    def not_found(handles: dict, prefetched: dict = None) -> set:
+        """Platforms whose handle a successful bulk call reported as nonexistent."""
+        prefetched = prefetched or {}
+        missing = set()
+        lc_profiles = prefetched.get("leetcode", {})
+        if handles.get("leetcode"):
+            lc_key = handles["leetcode"].strip().lower()
+            if lc_key in lc_profiles and not lc_profiles[lc_key]:
+                missing.add("leetcode")
+        cf_infos = prefetched.get("codeforces")
+        if handles.get("codeforces") and cf_infos is not None:
+            if not cf_infos.get(handles["codeforces"].strip().lower()):
+                missing.add("codeforces")
+        return missing
+
+    @staticmethod
+    async def verify_profile(handles: dict, previous: dict = None, prefetched: dict = None, only: list = None):
+        """
+        `previous` is the student's stored stats and `prefetched` the output of
+        prefetch(); both are optional and only used to skip redundant upstream calls.
+        `only` limits the fetch to those platforms; by default every handle is fetched.
+        """
         results = {}
         tasks = []
         platforms = []
+        previous = previous or {}
+        prefetched = prefetched or {}
+        if only is not None:
+            handles = {p: h for p, h in handles.items() if p in only}
 
         if handles.get("leetcode"):
-            tasks.append(LeetCodeService.get_user_profile(handles["leetcode"]))
-            platforms.append("leetcode")
+            lc_profiles = prefetched.get("leetcode", {})
+            lc_key = handles["leetcode"].strip().lower()
+            if lc_key in lc_profiles:
+                if lc_profiles[lc_key]:
+                    results["leetcode"] = lc_profiles[lc_key]
+            else:
+                tasks.append(LeetCodeService.get_user_profile(handles["leetcode"]))
+                platforms.append("leetcode")
             
         if handles.get("codeforces"):
-            tasks.append(CodeforcesService.get_user_profile(handles["codeforces"]))
-            platforms.append("codeforces")
+            cf_infos = prefetched.get("codeforces")
+            cf_info = cf_infos.get(handles["codeforces"].strip().lower()) if cf_infos is not None else None
+            # A handle missing from a successful bulk call doesn't exist on Codeforces
+            if cf_infos is None or cf_info:
+                tasks.append(CodeforcesService.get_user_profile(
+                    handles["codeforces"], info=cf_info, previous=previous.get("codeforces")
+                ))
+                platforms.append("codeforces")
 
         if handles.get("codechef"):
             tasks.append(CodeChefService.get_user_profile(handles["codechef"]))
@@ -28,7 +93,7 @@ class PlatformAggregator:
             platforms.append("hackerrank")
             
         if not tasks:
-            return {}
+            return results
             
         resolved = await asyncio.gather(*tasks, return_exceptions=True)
         
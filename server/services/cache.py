@@ -0,0 +1,249 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from pymongo import ReplaceOne
+from database import db
+from services.executors import executors
+
+# Seconds a cached upstream response is served without asking the upstream again
+CACHE_TTLS = {
+    "leetcode": 600,
+    "codeforces": 300,
+    "codechef": 1800,
+    "hackerrank": 3600,
+    "atcoder": 3600,
+}
+
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "mongo")  # "mongo", "disk" or "memory"
+# Size cap of the in-process tier, counted as the bytes of the cached bodies
+CACHE_MEMORY_BYTES = int(os.getenv("CACHE_MEMORY_BYTES", str(64 * 1024 * 1024)))
+CACHE_DIR = os.getenv("CACHE_DIR", "cache")
+
+# Expired entries are kept this long so they can still be revalidated with ETag/Last-Modified
+CACHE_RETAIN_SECONDS = 7 * 24 * 3600
+
+
+def cache_key(platform: str, handle: str, endpoint: str) -> str:
+    return f"{platform}:{handle.strip().lower()}:{endpoint}"
+
+
+def entry_size(entry: dict) -> int:
+    # The body dominates; headers and timestamps are a few hundred bytes at most
+    return len(entry.get("text", "")) + 256
+
+
+class MemoryTier:
+    """In-process LRU bounded by size, shared by the API loop and the scheduler thread."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    async def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    async def set(self, key: str, entry: dict):
+        size = entry_size(entry)
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.bytes -= entry_size(old)
+            if size > self.max_bytes:
+                return
+            self._entries[key] = entry
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.bytes -= entry_size(evicted)
+
+    async def set_many(self, entries: dict):
+        for key, entry in entries.items():
+            await self.set(key, entry)
+
+
+class MongoTier:
+    """Shared tier in the `http_cache` collection, purged by the TTL index on `purge_at` (see indexes.py)."""
+
+    collection_name = "http_cache"
+
+    async def get(self, key: str):
+        doc = await db.get_async_db()[self.collection_name].find_one({"_id": key})
+        return doc.get("entry") if doc else None
+
+    @staticmethod
+    def _document(entry: dict):
+        purge_at = datetime.utcfromtimestamp(entry["expires_at"]) + timedelta(seconds=CACHE_RETAIN_SECONDS)
+        return {"entry": entry, "purge_at": purge_at}
+
+    async def set(self, key: str, entry: dict):
+        await db.get_async_db()[self.collection_name].replace_one(
+            {"_id": key}, self._document(entry), upsert=True
+        )
+
+    async def set_many(self, entries: dict):
+        """One bulk_write for many keys, e.g. the per-user entries seeded from a bulk call."""
+        if entries:
+            await db.get_async_db()[self.collection_name].bulk_write(
+                [ReplaceOne({"_id": key}, self._document(entry), upsert=True) for key, entry in entries.items()],
+                ordered=False
+            )
+
+
+class DiskTier:
+    """One JSON file per key under CACHE_DIR, for deployments without a shared Mongo tier."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def setup(self):
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, key: str):
+        return os.path.join(self.directory, hashlib.sha1(key.encode()).hexdigest() + ".json")
+
+    def _read(self, key: str):
+        try:
+            with open(self._path(key), "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+        if entry["expires_at"] + CACHE_RETAIN_SECONDS < time.time():
+            return None
+        return entry
+
+    def _write(self, entries: dict):
+        os.makedirs(self.directory, exist_ok=True)
+        for key, entry in entries.items():
+            with open(self._path(key), "w", encoding="utf-8") as f:
+                json.dump(entry, f)
+
+    # File I/O runs on the thread pool so it doesn't stall the event loop
+    async def get(self, key: str):
+        return await executors.run_in_thread(self._read, key)
+
+    async def set(self, key: str, entry: dict):
+        await executors.run_in_thread(self._write, {key: entry})
+
+    async def set_many(self, entries: dict):
+        if entries:
+            await executors.run_in_thread(self._write, entries)
+
+
+class ResponseCache:
+    """
+    Caches upstream responses keyed by (platform, handle, endpoint).
+
+    Lookups go through the tiers in order and promote hits into the faster ones.
+    A tier failing (e.g. Mongo not connected) is logged and treated as a miss.
+    """
+
+    def __init__(self, tiers: list):
+        self.tiers = tiers
+        self.counters = {"hits": 0, "misses": 0, "revalidated": 0, "stores": 0, "errors": 0}
+
+    def setup(self):
+        for tier in self.tiers:
+            if hasattr(tier, "setup"):
+                try:
+                    tier.setup()
+                except Exception as e:
+                    print(f"Cache tier setup failed ({type(tier).__name__}): {e}")
+
+    async def get(self, key: str):
+        for i, tier in enumerate(self.tiers):
+            try:
+                entry = await tier.get(key)
+            except Exception as e:
+                self.counters["errors"] += 1
+                print(f"Cache read failed ({type(tier).__name__}): {e}")
+                continue
+            if entry is not None:
+                for faster in self.tiers[:i]:
+                    await faster.set(key, entry)
+                return entry
+        return None
+
+    async def set(self, key: str, entry: dict):
+        self.counters["stores"] += 1
+        for tier in self.tiers:
+            try:
+                await tier.set(key, entry)
+            except Exception as e:
+                self.counters["errors"] += 1
+                print(f"Cache write failed ({type(tier).__name__}): {e}")
+
+    async def set_many(self, entries: dict):
+        self.counters["stores"] += len(entries)
+        for tier in self.tiers:
+            try:
+                await tier.set_many(entries)
+            except Exception as e:
+                self.counters["errors"] += 1
+                print(f"Cache write failed ({type(tier).__name__}): {e}")
+
+    @staticmethod
+    def entry(platform: str, text: str, status: int = 200, headers: dict = None, ttl: int = None):
+        now = time.time()
+        return {
+            "status": status,
+            "text": text,
+            "headers": headers or {},
+            "stored_at": now,
+            "expires_at": now + (ttl if ttl is not None else CACHE_TTLS.get(platform, 300)),
+        }
+
+    async def store(self, key: str, platform: str, text: str, status: int = 200, headers: dict = None, ttl: int = None):
+        await self.set(key, self.entry(platform, text, status, headers, ttl))
+
+    async def store_json(self, key: str, platform: str, payload, ttl: int = None):
+        """Stores data that wasn't a raw response body, e.g. a parsed profile."""
+        await self.store(key, platform, json.dumps(payload), headers={"content-type": "application/json"}, ttl=ttl)
+
+    async def store_json_many(self, platform: str, payloads: dict, ttl: int = None):
+        """Seeds {key: payload} in one write per tier, e.g. every user out of a bulk call."""
+        await self.set_many({
+            key: self.entry(platform, json.dumps(payload), headers={"content-type": "application/json"}, ttl=ttl)
+            for key, payload in payloads.items()
+        })
+
+    async def get_json(self, key: str):
+        """A fresh payload stored with store_json(), or None."""
+        entry = await self.get(key)
+        if entry is not None and entry["expires_at"] > time.time():
+            self.counters["hits"] += 1
+            return json.loads(entry["text"])
+        self.counters["misses"] += 1
+        return None
+
+    def stats(self):
+        lookups = self.counters["hits"] + self.counters["revalidated"] + self.counters["misses"]
+        served = self.counters["hits"] + self.counters["revalidated"]
+        return {
+            **self.counters,
+            "hit_ratio": round(served / lookups, 4) if lookups else 0.0,
+            "backend": CACHE_BACKEND,
+            "memory_entries": len(self.tiers[0]._entries),
+            "memory_bytes": self.tiers[0].bytes,
+        }
+
+
+def _build_tiers():
+    tiers = [MemoryTier(CACHE_MEMORY_BYTES)]
+    if CACHE_BACKEND == "mongo":
+        tiers.append(MongoTier())
+    elif CACHE_BACKEND == "disk":
+        tiers.append(DiskTier(CACHE_DIR))
+    return tiers
+
+
+response_cache = ResponseCache(_build_tiers())
@@ -0,0 +1,118 @@
+import re
+from pymongo import UpdateOne
+from database import db
+from services.contests import clean_str
+
+# CodeChef splits a contest into divisions whose codes carry a letter suffix (START116B)
+CODECHEF_DIVISION_RE = re.compile(r"^([a-z]+\d+)[a-d]$")
+
+def parent_code(platform: str, code: str) -> str:
+    """The contest a (lowercased) code belongs to: a CodeChef division's code without its letter."""
+    if platform == "codechef":
+        match = CODECHEF_DIVISION_RE.match(code)
+        if match:
+            return match.group(1)
+    return code
+
+class ContestResults:
+    """
+    Per-contest index of students' history entries in `contest_results`, one
+    document per (platform, contest, student). Each carries the canonical key of
+    the contest title plus the platform's own id (CF contestId, LC slug, CC code)
+    and the parent contest's id (`parent`, which differs from the code only for
+    CodeChef divisions), so a contest report is one indexed query instead of a
+    scan of every history.
+    Kept in step by RatingHistory.save().
+    """
+
+    @staticmethod
+    def contest_keys(platform: str, entry: dict):
+        """Returns (key, code, start_time) of one history entry."""
+        if platform == "leetcode":
+            contest = entry.get("contest") or {}
+            title = contest.get("title", "")
+            # LeetCode slugs are the lowercased, hyphenated title (weekly-contest-400)
+            return clean_str(title), title.strip().lower().replace(" ", "-"), contest.get("startTime")
+        if platform == "codeforces":
+            return clean_str(entry.get("contestName", "")), str(entry.get("contestId", "")), entry.get("ratingUpdateTimeSeconds")
+        if platform == "codechef":
+            return clean_str(entry.get("name", "")), str(entry.get("code", "")).lower(), None
+        return None
+
+    @staticmethod
+    async def index(reg_no: str, histories: dict):
+        operations = []
+        for platform, entries in histories.items():
+            for entry in entries or []:
+                keys = ContestResults.contest_keys(platform, entry)
+                if not keys or not (keys[0] or keys[1]):
+                    continue
+                key, code, start_time = keys
+                operations.append(UpdateOne(
+                    {"platform": platform, "reg_no": reg_no, "key": key, "code": code},
+                    {"$set": {"parent": parent_code(platform, code), "start_time": start_time, "entry": entry}},
+                    upsert=True
+                ))
+        if operations:
+            await db.get_async_db()["contest_results"].bulk_write(operations, ordered=False)
+
+    @staticmethod
+    async def lookup(platform: str, reg_nos: list, contest_name: str, contest: dict = None):
+        """
+        Returns {reg_no: history entry} of one contest. `contest` is the stored
+        contest from ContestService.resolve(), when known; otherwise the typed name
+        is matched as an id/code, then as a title, then as part of a title.
+        """
+        collection = db.get_async_db()["contest_results"]
+        platform = platform.lower()
+        if contest:
+            key, code = clean_str(contest.get("name", "")), str(contest.get("code", "")).lower()
+        else:
+            key, code = clean_str(contest_name), contest_name.strip().lower()
+        if not key and not code:
+            return {}
+
+        # A parent code (START116) also takes in every division of the contest (START116A..D)
+        match = {"$or": [{"code": code}, {"parent": code}, {"key": key}]}
+        if not await collection.find_one({"platform": platform, **match}, {"_id": 1}):
+            # Typed names are often partial ("weekly 400"), and stored contests may name a
+            # contest differently from the histories: take the latest contest whose title
+            # or code contains it
+            conditions = [{"key": {"$regex": re.escape(k)}} for k in {key, clean_str(contest_name)} if k]
+            if code:
+                conditions.append({"code": {"$regex": re.escape(code)}})
+            partial = await collection.find_one(
+                {"platform": platform, "$or": conditions},
+                {"key": 1, "parent": 1},
+                sort=[("start_time", -1)]
+            ) if conditions else None
+            if not partial:
+                return {}
+            match = {"parent": partial["parent"]} if partial.get("parent") else {"key": partial["key"]}
+
+        cursor = collection.find(
+            {"platform": platform, "reg_no": {"$in": list(reg_nos)}, **match},
+            {"_id": 0, "reg_no": 1, "entry": 1}
+        )
+        return {doc["reg_no"]: doc["entry"] for doc in await cursor.to_list()}
+
+    @staticmethod
+    async def backfill():
+        """Indexes stored histories saved before contest_results existed, and adds `parent` to older results."""
+        results = db.get_async_db()["contest_results"]
+        operations = [
+            UpdateOne({"_id": doc["_id"]}, {"$set": {"parent": parent_code(doc["platform"], doc.get("code", ""))}})
+            async for doc in results.find({"parent": {"$exists": False}}, {"platform": 1, "code": 1})
+        ]
+        if operations:
+            await results.bulk_write(operations, ordered=False)
+            print(f"Added parent contest codes to {len(operations)} contest results")
+
+        indexed = 0
+        histories = db.get_async_db()["rating_history"]
+        async for doc in histories.find({"results_indexed": {"$ne": True}}):
+            await ContestResults.index(doc["reg_no"], {doc["platform"]: doc.get("entries", [])})
+            await histories.update_one({"_id": doc["_id"]}, {"$set": {"results_indexed": True}})
+            indexed += 1
+        if indexed:
+            print(f"Indexed contest results of {indexed} stored histories")
@@ -1,33 +1,109 @@
-import httpx
+import asyncio
+import os
+import re
+import time
+from pymongo import UpdateOne
+from database import db
+from .http_client import http_clients
 from datetime import datetime, timezone
 
+# How often the background task refreshes the contest calendar
+CONTEST_REFRESH_SECONDS = int(os.getenv("CONTEST_REFRESH_SECONDS", "900"))
+UPCOMING_LIMIT = 10
+
+# Platform names as stored in `contests`, by their lowercase form
+CONTEST_PLATFORMS = {
+    "codeforces": "Codeforces",
+    "leetcode": "LeetCode",
+    "atcoder": "AtCoder",
+    "codechef": "CodeChef",
+}
+# Contest codes compare case-insensitively (START100 / start100, abc300 / ABC300)
+CODE_COLLATION = {"locale": "en", "strength": 2}
+
+def clean_str(s):
+    # Standardize: lowercase, remove spaces, hyphens, underscores, dots
+    return str(s).lower().replace(" ", "").replace("-", "").replace("_", "").replace(".", "")
+
 class ContestService:
     @staticmethod
     async def get_upcoming():
-        contests = []
-        now = datetime.now(timezone.utc).timestamp()
-        
+        return await contest_calendar.get()
+
+    @staticmethod
+    async def get_range(start: float = None, end: float = None, platform: str = None, limit: int = 100):
+        """Stored contests starting in [start, end), ordered by start time."""
+        query = {}
+        if start is not None or end is not None:
+            query["start_time"] = {}
+            if start is not None:
+                query["start_time"]["$gte"] = start
+            if end is not None:
+                query["start_time"]["$lt"] = end
+        if platform:
+            query["platform"] = CONTEST_PLATFORMS.get(platform.lower(), platform)
+        cursor = db.get_async_db()["contests"].find(query, {"_id": 0}, sort=[("start_time", 1)], limit=limit)
+        return await cursor.to_list()
+
+    @staticmethod
+    async def resolve(platform: str, contest_name: str):
+        """
+        Finds a stored contest from what a user typed: its platform id, slug or code
+        first (e.g. 1950, weekly-contest-400, START100, abc350), then its exact name,
+        then a loose match on the name. Returns None when nothing matches.
+        """
+        if not platform or not contest_name:
+            return None
+        collection = db.get_async_db()["contests"]
+        name = CONTEST_PLATFORMS.get(platform.lower(), platform)
+        typed = contest_name.strip()
+
+        for field in ("code", "name"):
+            contest = await collection.find_one({"platform": name, field: typed}, {"_id": 0}, collation=CODE_COLLATION)
+            if contest:
+                return contest
+
+        # Loose match, newest first, over this platform's names only: the typed characters
+        # in order, with the separators clean_str() drops allowed between them
+        wanted = clean_str(typed)
+        if not wanted:
+            return None
+        pattern = r"[\s\-_.]*".join(re.escape(ch) for ch in wanted)
+        return await collection.find_one(
+            {"platform": name, "name": {"$regex": pattern, "$options": "i"}},
+            {"_id": 0},
+            sort=[("start_time", -1)]
+        )
+
+    @staticmethod
+    async def fetch_codeforces(now: float):
         # 1. Codeforces (API)
+        contests = []
         try:
-             async with httpx.AsyncClient() as client:
-                res = await client.get("https://codeforces.com/api/contest.list?gym=false", timeout=5.0)
-                if res.status_code == 200:
-                    data = res.json()
-                    if data["status"] == "OK":
-                        for c in data["result"]:
-                            if c["phase"] == "BEFORE":
-                                contests.append({
-                                    "id": f"cf-{c['id']}",
-                                    "name": c["name"],
-                                    "platform": "Codeforces",
-                                    "start_time": c["startTimeSeconds"],
-                                    "duration": c["durationSeconds"],
-                                    "url": f"https://codeforces.com/contest/{c['id']}"
-                                })
+             res = await http_clients.request("codeforces", "GET", "https://codeforces.com/api/contest.list?gym=false", timeout=5.0)
+             if res.status_code == 200:
+                 data = res.json()
+                 if data["status"] == "OK":
+                     for c in data["result"]:
+                         contests.append({
+                             "id": f"cf-{c['id']}",
+                             "code": str(c["id"]),
+                             "name": c["name"],
+                             "platform": "Codeforces",
+                             "start_time": c.get("startTimeSeconds", 0),
+                             "duration": c["durationSeconds"],
+                             "phase": c["phase"],
+                             "url": f"https://codeforces.com/contest/{c['id']}"
+                         })
         except Exception as e:
             print(f"CF Contest Error: {e}")
+            return None
+        return contests
 
-        # 2. LeetCode (GraphQL)
+    @staticmethod
+    async def fetch_leetcode(now: float):
+        # 2. LeetCode (GraphQL) - the next two contests plus the latest finished ones
+        contests = []
         try:
             query = """
             {
@@ -36,61 +112,190 @@ class ContestService:
                     startTime
                     titleSlug
                 }
+                pastContests(pageNo: 1, numPerPage: 10) {
+                    data {
+                        title
+                        startTime
+                        titleSlug
+                    }
+                }
             }
             """
-            async with httpx.AsyncClient() as client:
-                res = await client.post("https://leetcode.com/graphql", json={"query": query}, timeout=5.0)
-                data = res.json()
-                if "data" in data and "topTwoContests" in data["data"]:
-                     for c in data["data"]["topTwoContests"]:
-                         # Check if future
-                         if c["startTime"] > now:
-                             contests.append({
-                                "id": f"lc-{c['titleSlug']}",
-                                "name": c["title"],
-                                "platform": "LeetCode",
-                                "start_time": c["startTime"],
-                                "duration": 5400, # 1 hr 30 mins standard usually
-                                "url": f"https://leetcode.com/contest/{c['titleSlug']}"
-                             })
+            res = await http_clients.request("leetcode", "POST", "https://leetcode.com/graphql", json={"query": query}, timeout=5.0)
+            data = res.json()
+            if "data" in data and "topTwoContests" in data["data"]:
+                 past = ((data["data"].get("pastContests") or {}).get("data")) or []
+                 for c in data["data"]["topTwoContests"] + past:
+                     contests.append({
+                        "id": f"lc-{c['titleSlug']}",
+                        "code": c["titleSlug"],
+                        "name": c["title"],
+                        "platform": "LeetCode",
+                        "start_time": c["startTime"],
+                        "duration": 5400, # 1 hr 30 mins standard usually
+                        "url": f"https://leetcode.com/contest/{c['titleSlug']}"
+                     })
         except Exception as e:
              print(f"LC Contest Error: {e}")
+             return None
+        return contests
 
+    @staticmethod
+    async def fetch_atcoder(now: float):
         # 3. AtCoder (Kenkoooo)
+        contests = []
         try:
-             async with httpx.AsyncClient() as client:
-                res = await client.get("https://kenkoooo.com/atcoder/resources/contests.json", timeout=5.0)
-                if res.status_code == 200:
-                    data = res.json()
-                    for c in data:
-                        start = c["start_epoch_second"]
-                        if start > now:
-                            contests.append({
-                                "id": c["id"],
-                                "name": c["title"],
-                                "platform": "AtCoder",
-                                "start_time": start,
-                                "duration": c["duration_second"],
-                                "url": f"https://atcoder.jp/contests/{c['id']}"
-                            })
+             res = await http_clients.request("atcoder", "GET", "https://kenkoooo.com/atcoder/resources/contests.json", timeout=5.0)
+             if res.status_code == 200:
+                 data = res.json()
+                 for c in data:
+                     contests.append({
+                         "id": c["id"],
+                         "code": c["id"],
+                         "name": c["title"],
+                         "platform": "AtCoder",
+                         "start_time": c["start_epoch_second"],
+                         "duration": c["duration_second"],
+                         "url": f"https://atcoder.jp/contests/{c['id']}"
+                     })
         except Exception as e:
              print(f"AtCoder Contest Error: {e}")
+             return None
+        return contests
 
-        # 4. CodeChef (Mock/Scrape - API is hard, mocking scheduled for now or skipping)
-        # CodeChef usually has Starters every Wednesday at 8PM IST.
-        # We can try to fetch from a public calendar proxy if available, but for now let's skip to keep it reliable.
-        # Or simpler:
+    @staticmethod
+    async def fetch_codechef(now: float):
+        # 4. CodeChef (public contest list used by the site itself)
+        contests = []
         try:
-            # CodeChefs "upcoming" api often accessible via:
-            async with httpx.AsyncClient() as client:
-                # This is a common public endpoint for some tools, or we check main site.
-                # Actually, clist is best but we avoid auth.
-                # Let's try a direct scrape of a known json if exists? No.
-                # We will omit CodeChef for this MVP step unless we find a stable unchecked endpoint.
-                pass
-        except:
-            pass
+            res = await http_clients.request("codechef", "GET", "https://www.codechef.com/api/list/contests/all", timeout=10.0)
+            if res.status_code == 200:
+                data = res.json()
+                for group in ("future_contests", "present_contests", "past_contests"):
+                    for c in data.get(group) or []:
+                        start = datetime.fromisoformat(c["contest_start_date_iso"]).timestamp()
+                        contests.append({
+                            "id": f"cc-{c['contest_code']}",
+                            "code": c["contest_code"],
+                            "name": c["contest_name"],
+                            "platform": "CodeChef",
+                            "start_time": int(start),
+                            "duration": int(c.get("contest_duration") or 0) * 60,
+                            "url": f"https://www.codechef.com/{c['contest_code']}"
+                        })
+        except Exception as e:
+            print(f"CodeChef Contest Error: {e}")
+            return None
+        return contests
+
+
+class ContestStore:
+    """
+    Keeps the `contests` collection in step with the fetched calendar. Only
+    contests that are new or changed since the last sync by this process are
+    written, so a refresh re-sending thousands of finished contests costs nothing.
+    """
+
+    def __init__(self):
+        self._written = {}
+
+    async def sync(self, contests: list):
+        operations = []
+        for contest in contests:
+            if self._written.get(contest["id"]) == contest:
+                continue
+            operations.append(UpdateOne({"id": contest["id"]}, {"$set": contest}, upsert=True))
+        if not operations:
+            return 0
+        await db.get_async_db()["contests"].bulk_write(operations, ordered=False)
+        for contest in contests:
+            self._written[contest["id"]] = contest
+        return len(operations)
+
+contest_store = ContestStore()
+
+
+class ContestCalendar:
+    """
+    Upcoming contests held in memory and refreshed by a background task, so the
+    dashboard never waits on the platforms. Reads are stale-while-revalidate: a
+    calendar older than the refresh interval is still served while a refresh runs.
+    A source that fails keeps its last good list. Every refresh also lands in the
+    `contests` collection through contest_store.
+    """
+
+    SOURCES = {
+        "Codeforces": ContestService.fetch_codeforces,
+        "LeetCode": ContestService.fetch_leetcode,
+        "AtCoder": ContestService.fetch_atcoder,
+        "CodeChef": ContestService.fetch_codechef,
+    }
+
+    def __init__(self):
+        self.sources = {}
+        self.upcoming = []
+        self.updated_at = None
+        self._task = None
+        self._refreshing = None
+
+    async def refresh(self):
+        now = datetime.now(timezone.utc).timestamp()
+        names = list(self.SOURCES)
+        results = await asyncio.gather(*(self.SOURCES[name](now) for name in names))
+        fetched = []
+        for name, contests in zip(names, results):
+            if contests is not None:
+                self.sources[name] = contests
+                fetched.extend(contests)
 
+        merged = [c for contests in self.sources.values() for c in contests if c["start_time"] > now]
         # Sort by start time
-        contests.sort(key=lambda x: x["start_time"])
-        return contests[:10] # Return top 10
+        merged.sort(key=lambda x: x["start_time"])
+        self.upcoming = merged
+        self.updated_at = time.monotonic()
+
+        try:
+            await contest_store.sync(fetched)
+        except Exception as e:
+            print(f"Contest store sync error: {e}")
+
+    def _revalidate(self):
+        if self._refreshing is None or self._refreshing.done():
+            self._refreshing = asyncio.create_task(self.refresh())
+        return self._refreshing
+
+    async def get(self):
+        if self.updated_at is None:
+            # Nothing cached yet: the first caller waits for the initial fetch
+            await self._revalidate()
+        elif time.monotonic() - self.updated_at > CONTEST_REFRESH_SECONDS:
+            self._revalidate()
+
+        # Contests that started since the last refresh drop out here
+        now = datetime.now(timezone.utc).timestamp()
+        return [c for c in self.upcoming if c["start_time"] > now][:UPCOMING_LIMIT]
+
+    async def _run(self):
+        while True:
+            try:
+                await self._revalidate()
+            except Exception as e:
+                print(f"Contest calendar refresh error: {e}")
+            await asyncio.sleep(CONTEST_REFRESH_SECONDS)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        for task in (self._task, self._refreshing):
+            if task and not task.done():
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._task = None
+        self._refreshing = None
+
+contest_calendar = ContestCalendar()
@@ -0,0 +1,124 @@
+import asyncio
+import multiprocessing
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+# Thread pool: blocking I/O and light CPU work (file writes, pandas/openpyxl, JSON decoding)
+EXECUTOR_THREADS = int(os.getenv("EXECUTOR_THREADS", "8"))
+# Process pool: heavy pure-Python parsing that would hold the GIL. 0 runs that work on the thread pool instead.
+EXECUTOR_PROCESSES = int(os.getenv("EXECUTOR_PROCESSES", str(min(2, os.cpu_count() or 1))))
+
+# Event-loop lag sampling: how often the monitor wakes up, and the lag counted as a stall
+LOOP_LAG_INTERVAL = float(os.getenv("LOOP_LAG_INTERVAL", "0.5"))
+LOOP_LAG_STALL = float(os.getenv("LOOP_LAG_STALL", "0.1"))
+
+
+class Executors:
+    """
+    Shared pools that coroutines hand blocking or CPU-bound work to, so it doesn't
+    run on the event loop thread. Both pools are created on first use and serve
+    the API loop and the scheduler thread alike.
+    """
+
+    def __init__(self):
+        self._threads = None
+        self._processes = None
+        self.counters = {"thread_tasks": 0, "process_tasks": 0, "process_fallbacks": 0}
+
+    def threads(self):
+        if self._threads is None:
+            self._threads = ThreadPoolExecutor(max_workers=EXECUTOR_THREADS, thread_name_prefix="worker")
+        return self._threads
+
+    def processes(self):
+        if self._processes is None and EXECUTOR_PROCESSES > 0:
+            # spawn, not fork: the parent has live threads (scheduler, pools) that fork would copy mid-state
+            self._processes = ProcessPoolExecutor(
+                max_workers=EXECUTOR_PROCESSES,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._processes
+
+    async def run_in_thread(self, fn, *args):
+        self.counters["thread_tasks"] += 1
+        return await asyncio.get_running_loop().run_in_executor(self.threads(), fn, *args)
+
+    async def run_in_process(self, fn, *args):
+        """`fn` and its arguments must be picklable: a module-level function and plain data."""
+        pool = self.processes()
+        if pool is None:
+            self.counters["process_fallbacks"] += 1
+            return await self.run_in_thread(fn, *args)
+        self.counters["process_tasks"] += 1
+        return await asyncio.get_running_loop().run_in_executor(pool, fn, *args)
+
+    def stats(self):
+        return {**self.counters, "threads": EXECUTOR_THREADS, "processes": EXECUTOR_PROCESSES}
+
+    def shutdown(self):
+        for pool in (self._threads, self._processes):
+            if pool is not None:
+                pool.shutdown(wait=False, cancel_futures=True)
+        self._threads = None
+        self._processes = None
+
+executors = Executors()
+
+
+class LoopLagMonitor:
+    """
+    Measures how late the event loop wakes a sleeping task. Anything blocking the
+    loop (inline parsing, a sync DB call) shows up here as lag.
+    """
+
+    def __init__(self):
+        self._task = None
+        self.reset()
+
+    def reset(self):
+        self.samples = 0
+        self.stalls = 0
+        self.last = 0.0
+        self.max = 0.0
+        self.total = 0.0
+        self.since = time.time()
+
+    async def _run(self):
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(LOOP_LAG_INTERVAL)
+            lag = max(0.0, time.perf_counter() - start - LOOP_LAG_INTERVAL)
+            self.samples += 1
+            self.last = lag
+            self.total += lag
+            self.max = max(self.max, lag)
+            if lag >= LOOP_LAG_STALL:
+                self.stalls += 1
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self):
+        return {
+            "interval_ms": LOOP_LAG_INTERVAL * 1000,
+            "stall_threshold_ms": LOOP_LAG_STALL * 1000,
+            "samples": self.samples,
+            "stalls": self.stalls,
+            "last_ms": round(self.last * 1000, 2),
+            "mean_ms": round(self.total / self.samples * 1000, 2) if self.samples else 0.0,
+            "max_ms": round(self.max * 1000, 2),
+            "since": self.since,
+        }
+
+loop_lag = LoopLagMonitor()
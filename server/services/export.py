@@ -1,347 +1,485 @@
-import pandas as pd
+import csv
 import io
-from models.student import Student
+import json
+import os
+import tempfile
+import pandas as pd
+import xlsxwriter
 from database import db
+from services.contest_results import ContestResults
+from services.executors import executors
+from services.contests import ContestService
 from datetime import datetime
 
+# Sheets of the multi-sheet performance report, in workbook order
+PERFORMANCE_SHEETS = ["LeetCode", "CodeChef", "Codeforces", "HackerRank"]
+EMPTY_SHEET_COLUMNS = ["S.No", "Name", "Department"]
+# Columns every performance sheet starts with; kept unprefixed in the flat formats
+BASE_COLUMNS = ["S.No", "Reg No", "Name", "Department"]
+
+# Only what the reports read, so exports don't pull whole student documents
+EXPORT_PROJECTION = {"reg_no": 1, "name": 1, "department": 1, "handles": 1, "stats": 1}
+
+STREAM_CHUNK_SIZE = 64 * 1024
+
+EXPORT_FORMATS = {
+    "xlsx": ("xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    "csv": ("csv", "text/csv"),
+    "parquet": ("parquet", "application/vnd.apache.parquet"),
+    "ndjson": ("ndjson", "application/x-ndjson"),
+}
+
+
+def parquet_column(values: list):
+    """
+    Report cells mix numbers with markers like "Absent" or "N/A". Numeric columns
+    are kept as they are; any column holding text is stored as strings.
+    """
+    if all(v is None or (isinstance(v, (int, float)) and not isinstance(v, bool)) for v in values):
+        return values
+    return [None if v is None else str(v) for v in values]
+
+
+class XlsxStreamWriter:
+    """
+    Writes an .xlsx workbook row by row with xlsxwriter's constant_memory mode, so
+    memory stays flat however many students are exported. Column widths are tracked
+    as rows go by and applied when the workbook is closed.
+    """
+
+    def __init__(self, path: str = None):
+        if path is None:
+            fd, path = tempfile.mkstemp(suffix=".xlsx")
+            os.close(fd)
+        self.path = path
+        self.workbook = xlsxwriter.Workbook(self.path, {"constant_memory": True})
+        self.header_format = self.workbook.add_format({"bold": True, "border": 1, "align": "center"})
+        self.sheets = {}
+
+    def add_sheet(self, name: str, columns: list, title: str = None):
+        worksheet = self.workbook.add_worksheet(name)
+        sheet = {"worksheet": worksheet, "columns": columns, "row": 0, "widths": [len(str(c)) for c in columns]}
+        self.sheets[name] = sheet
+
+        if title:
+            # Big merged title row, leaving a blank row before the table header
+            title_format = self.workbook.add_format({"bold": True, "font_size": 24, "align": "center", "valign": "vcenter"})
+            if len(columns) > 1:
+                worksheet.merge_range(0, 0, 0, len(columns) - 1, title, title_format)
+            else:
+                worksheet.write(0, 0, title, title_format)
+            sheet["widths"][0] = max(sheet["widths"][0], len(title))
+            sheet["row"] = 2
+
+        worksheet.write_row(sheet["row"], 0, columns, self.header_format)
+        sheet["row"] += 1
+
+    def write_row(self, name: str, row: dict):
+        sheet = self.sheets[name]
+        values = [row.get(column, "") for column in sheet["columns"]]
+        sheet["worksheet"].write_row(sheet["row"], 0, values)
+        sheet["row"] += 1
+
+        widths = sheet["widths"]
+        for i, value in enumerate(values):
+            length = len(str(value)) if value is not None else 0
+            if length > widths[i]:
+                widths[i] = length
+
+    def close(self) -> str:
+        for sheet in self.sheets.values():
+            for i, width in enumerate(sheet["widths"]):
+                sheet["worksheet"].set_column(i, i, width + 2)
+        self.workbook.close()
+        return self.path
+
+
 class ExportService:
+    """Builds report rows from the student data; rendering lives in ExportRenderer."""
+
     @staticmethod
-    @staticmethod
-    async def generate_excel(department: str = None, year: int = None, platform: str = None, contest_name: str = None, contest_date: str = None):
-        from .platforms.codeforces import CodeforcesService  # Import here to avoid circular dep if any
-        
+    def student_query(department: str = None, year: int = None):
         query = {}
         if department and department != "All":
             query["department"] = department
         if year and year != "All":
             query["year"] = int(year)
+        return query
+
+    @staticmethod
+    def students_cursor(department: str = None, year: int = None):
+        return db.get_async_db()["students"].find(
+            ExportService.student_query(department, year),
+            EXPORT_PROJECTION,
+            # Stored reg_no order, so the (department, year, reg_no) and reg_no indexes serve the sort
+            sort=[("reg_no", 1)]
+        )
 
-        students = list(db.get_db()["students"].find(query))
+    @staticmethod
+    def performance_rows(idx: int, s: dict):
+        """Returns {sheet name: row} for one student of the performance report."""
+        base_info = {
+            "S.No": idx,
+            "Reg No": s.get("reg_no", "Unknown"),
+            "Name": s.get("name", "Unknown"),
+            "Department": s.get("department", "Unknown")
+        }
+        stats = s.get("stats", {})
         
-        # Sort by Reg No (case-insensitive alphanumeric sort)
-        try:
-             students.sort(key=lambda s: s.get("reg_no", "").lower())
-        except:
-             pass
+        # LeetCode Row
+        lc = stats.get("leetcode", {})
+        lc_row = {
+            **base_info,
+            "LeetCode Easy": lc.get("easy", 0),
+            "LeetCode Medium": lc.get("medium", 0),
+            "LeetCode Hard": lc.get("hard", 0),
+            "Total Solved": lc.get("total_solved", 0),
+            "Contest Count": lc.get("attended", 0),
+            "Contest Rating": lc.get("rating", "N/A"),
+            "Global Rank": lc.get("global_rank", "N/A"),
+            "Top %": f"{lc.get('top_percentage', 0)}%" if lc.get('top_percentage') else "N/A"
+        }
         
-        output = io.BytesIO()
+        # CodeChef Row
+        cc = stats.get("codechef", {})
+        cc_row = {
+            **base_info,
+            "Rating": cc.get("rating", 0),
+            "Global Rank": cc.get("global_rank", "N/A"),
+            "Stars": cc.get("stars", 0),
+            "Solved": cc.get("solved", 0),
+            "Contests": cc.get("contests", 0)
+        }
         
-        # --- Contest Report Mode ---
-        if platform and contest_name:
-            data = []
-            selected_platform = platform.lower()
+        # Codeforces Row
+        cf = stats.get("codeforces", {})
+        cf_row = {
+            **base_info,
+            "Rating": cf.get("rating", 0),
+            "Max Rating": cf.get("max_rating", 0),
+            "Rank": cf.get("rank", "Unrated"),
+            "Total Solved": cf.get("solved", 0),
+            "Contests": cf.get("contests", 0)
+        }
+        
+        # HackerRank Row
+        hr = stats.get("hackerrank", {})
+        hr_row = {
+            **base_info,
+            "Badges": hr.get("badges", 0),
+            "Solved": hr.get("solved", 0)
+        }
+        return {"LeetCode": lc_row, "CodeChef": cc_row, "Codeforces": cf_row, "HackerRank": hr_row}
+
+    @staticmethod
+    def performance_record(idx: int, s: dict):
+        """One wide row per student for the flat formats, sheet columns prefixed with the platform."""
+        record = {}
+        for sheet, row in ExportService.performance_rows(idx, s).items():
+            for key, value in row.items():
+                if key not in BASE_COLUMNS and not key.startswith(sheet):
+                    key = f"{sheet} {key}"
+                record[key] = value
+        return record
+
+    @staticmethod
+    async def contest_rows(students: list, platform: str, contest_name: str):
+        """
+        Returns (columns, rows, contest) for one contest across the given students;
+        contest is the stored contest the name resolved to, or None.
+        """
+        from .platforms.codeforces import CodeforcesService  # Import here to avoid circular dep if any
+
+        data = []
+        selected_platform = platform.lower()
+
+        # Contest id/slug/code from the local contests store, when it knows the contest
+        contest = await ContestService.resolve(platform, contest_name)
+        contest_id = contest["code"] if contest else contest_name
+        
+        # --- Codeforces Live Fetch Logic ---
+        cf_standings = None
+        cf_problems = None
+        if selected_platform == "codeforces" and contest_id.isdigit():
+             # Valid Contest ID, try fetching live data
+             handles = [s.get("handles", {}).get("codeforces") for s in students if s.get("handles", {}).get("codeforces")]
+             handles = [h for h in handles if h] # Filter None
+             
+             cf_rows, cf_probs = await CodeforcesService.get_contest_standings(contest_id, handles)
+             if cf_rows:
+                 # Map by handle (lowercase)
+                 cf_standings = {}
+                 for r in cf_rows:
+                     for m in r["party"]["members"]:
+                         h_low = m["handle"].lower()
+                         cf_standings[h_low] = r
+                 cf_problems = cf_probs
+
+        # Each student's entry for this contest, from the contest_results index
+        results = await ContestResults.lookup(selected_platform, [s.get("reg_no") for s in students], contest_name, contest)
+
+        for idx, s in enumerate(students, 1):
+            base_info = {
+                "S. No": idx,
+                "Register Number": s.get("reg_no", "Unknown"),
+                "Name of the Student": s.get("name", "Unknown"),
+            }
+            stats = s.get("stats", {}).get(selected_platform, {})
             
-            # --- Codeforces Live Fetch Logic ---
-            cf_standings = None
-            cf_problems = None
-            if selected_platform == "codeforces" and contest_name.isdigit():
-                 # Valid Contest ID, try fetching live data
-                 handles = [s.get("handles", {}).get("codeforces") for s in students if s.get("handles", {}).get("codeforces")]
-                 handles = [h for h in handles if h] # Filter None
-                 
-                 cf_rows, cf_probs = await CodeforcesService.get_contest_standings(contest_name, handles)
-                 if cf_rows:
-                     # Map by handle (lowercase)
-                     cf_standings = {}
-                     for r in cf_rows:
-                         for m in r["party"]["members"]:
-                             h_low = m["handle"].lower()
-                             cf_standings[h_low] = r
-                     cf_problems = cf_probs
-
-            for idx, s in enumerate(students, 1):
-                base_info = {
-                    "S. No": idx,
-                    "Register Number": s.get("reg_no", "Unknown"),
-                    "Name of the Student": s.get("name", "Unknown"),
+            row = {}
+            if selected_platform == "leetcode":
+                contest_stats = results.get(s.get("reg_no"))
+                
+                # If found, use contest specific stats
+                solved_count = contest_stats.get("problemsSolved", 0) if contest_stats else 0
+                contest_rating = contest_stats.get("rating", "Absent") if contest_stats else "Absent"
+                
+                # Note: LeetCode API doesn't give Easy/Medium/Hard breakdown per contest in this history, just total solved (0-4).
+                # We will put total solved in 'Total' and 0 in others to avoid confusion, or try to distribute if we knew better.
+                # For now, we put the count in Total.
+                
+                # Calculate Top % for Specific Contest
+                top_percent_str = "N/A"
+                if contest_stats:
+                    rank = contest_stats.get("ranking", 0)
+                    total_participants = contest_stats.get("totalParticipants", 0)
+                    if total_participants > 0 and rank > 0:
+                        top_percent = (rank / total_participants) * 100
+                        top_percent_str = f"{top_percent:.2f}%"
+
+                row = {
+                    **base_info,
+                    "Leet Code Easy": "-", # Not available in simple history
+                    "Leet Code Medium": "-",
+                    "Leet code Hard": "-",
+                    "Total": solved_count if contest_stats else "Absent",
+                    "Contest count": stats.get("attended", 0), # Overall attended
+                    "Contest Rating": contest_rating,
+                    "Global Rank": stats.get("global_rank", "N/A"),
+                    "Top %": top_percent_str
                 }
-                stats = s.get("stats", {}).get(selected_platform, {})
+            elif selected_platform == "codeforces":
+                # Check if we have live data
+                unique_cf_row = None
+                if cf_standings:
+                    handle = s.get("handles", {}).get("codeforces", "").lower()
+                    unique_cf_row = cf_standings.get(handle)
                 
-                row = {}
-                if selected_platform == "leetcode":
-                    # Try to find specific contest data
-                    history = stats.get("history", [])
-                    contest_stats = None
-                    
-                    if contest_name:
-                        # Fuzzy match or exact match contest name
-                        # Standardize: lowercase, remove spaces, hyphens, underscores
-                        def clean_str(s):
-                            return str(s).lower().replace(" ", "").replace("-", "").replace("_", "").replace(".", "")
-                            
-                        clean_name = clean_str(contest_name)
-                        for h in history:
-                            c_title = clean_str(h.get("contest", {}).get("title", ""))
-                            if clean_name in c_title:
-                                contest_stats = h
-                                break
-                    
-                    # If found, use contest specific stats
-                    solved_count = contest_stats.get("problemsSolved", 0) if contest_stats else 0
-                    contest_rating = contest_stats.get("rating", "Absent") if contest_stats else "Absent"
+                if unique_cf_row:
+                    # Use Live Data
+                    points = unique_cf_row.get("points", 0)
+                    rank = unique_cf_row.get("rank", 0)
+                    penalty = unique_cf_row.get("penalty", 0)
                     
-                    # Note: LeetCode API doesn't give Easy/Medium/Hard breakdown per contest in this history, just total solved (0-4).
-                    # We will put total solved in 'Total' and 0 in others to avoid confusion, or try to distribute if we knew better.
-                    # For now, we put the count in Total.
+                    # Calculate solved count from problemResults
+                    solved_cnt = 0
+                    problem_results = unique_cf_row.get("problemResults", [])
                     
-                    # Calculate Top % for Specific Contest
-                    top_percent_str = "N/A"
-                    if contest_stats:
-                        rank = contest_stats.get("ranking", 0)
-                        total_participants = contest_stats.get("totalParticipants", 0)
-                        if total_participants > 0 and rank > 0:
-                            top_percent = (rank / total_participants) * 100
-                            top_percent_str = f"{top_percent:.2f}%"
-
                     row = {
                         **base_info,
-                        "Leet Code Easy": "-", # Not available in simple history
-                        "Leet Code Medium": "-",
-                        "Leet code Hard": "-",
-                        "Total": solved_count if contest_stats else "Absent",
-                        "Contest count": stats.get("attended", 0), # Overall attended
-                        "Contest Rating": contest_rating,
-                        "Global Rank": stats.get("global_rank", "N/A"),
-                        "Top %": top_percent_str
+                        "Rank": rank,
+                        "Points": points,
+                        "Penalty": penalty
                     }
-                elif selected_platform == "codeforces":
-                    # Check if we have live data
-                    unique_cf_row = None
-                    if cf_standings:
-                        handle = s.get("handles", {}).get("codeforces", "").lower()
-                        unique_cf_row = cf_standings.get(handle)
                     
-                    if unique_cf_row:
-                        # Use Live Data
-                        points = unique_cf_row.get("points", 0)
-                        rank = unique_cf_row.get("rank", 0)
-                        penalty = unique_cf_row.get("penalty", 0)
-                        
-                        # Calculate solved count from problemResults
-                        solved_cnt = 0
-                        problem_results = unique_cf_row.get("problemResults", [])
-                        
-                        row = {
-                            **base_info,
-                            "Rank": rank,
-                            "Points": points,
-                            "Penalty": penalty
-                        }
-                        
-                        # Add dynamic problem columns
-                        if cf_problems:
-                            for i, p in enumerate(cf_problems):
-                                p_idx = p.get("index", str(i))
-                                res = problem_results[i] if i < len(problem_results) else {}
-                                points_got = res.get("points", 0)
-                                if points_got > 0:
-                                    row[p_idx] = points_got
-                                    solved_cnt += 1
-                                else:
-                                    row[p_idx] = 0
-                        
-                        row["Total Solved"] = solved_cnt
-                        
-                    else:
-                        # Fallback to stored history
-                        history = stats.get("history", [])
-                        contest_stats = None
-                        if contest_name:
-                                def clean_str(s):
-                                    return str(s).lower().replace(" ", "").replace("-", "").replace("_", "").replace(".", "")
-
-                                clean_name = clean_str(contest_name)
-                                for h in history:
-                                    # Check Contest Name
-                                    c_title = clean_str(h.get("contestName", ""))
-                                    # Check Contest ID
-                                    c_id = str(h.get("contestId", ""))
-                                    
-                                    if clean_name in c_title or clean_name == c_id:
-                                        contest_stats = h
-                                        break
-
-                        row = {
-                            **base_info,
-                            "Contest Rank": contest_stats.get("rank", "Absent") if contest_stats else "Absent",
-                            "Rating After": contest_stats.get("newRating", "Absent") if contest_stats else "Absent",
-                            "Rating Change": (contest_stats.get("newRating", 0) - contest_stats.get("oldRating", 0)) if contest_stats else "-",
-                            "Current Rating": stats.get("rating", 0),
-                            "Total Solved": stats.get("solved", 0)
-                        }
-                        
-                elif selected_platform == "codechef":
-                     history = stats.get("history", [])
-                     contest_stats = None
-                     if contest_name:
-                         clean_name = contest_name.lower().replace(" ", "")
-                         for h in history:
-                             # Codechef history has 'name' (e.g. Starters 100) and 'code' (e.g. START100)
-                             c_title = h.get("name", "").lower().replace(" ", "")
-                             c_code = h.get("code", "").lower()
-                             if clean_name in c_title or clean_name in c_code:
-                                 contest_stats = h
-                                 break
+                    # Add dynamic problem columns
+                    if cf_problems:
+                        for i, p in enumerate(cf_problems):
+                            p_idx = p.get("index", str(i))
+                            res = problem_results[i] if i < len(problem_results) else {}
+                            points_got = res.get("points", 0)
+                            if points_got > 0:
+                                row[p_idx] = points_got
+                                solved_cnt += 1
+                            else:
+                                row[p_idx] = 0
+                    
+                    row["Total Solved"] = solved_cnt
                     
-                     row = {
+                else:
+                    # Fallback to stored history
+                    contest_stats = results.get(s.get("reg_no"))
+
+                    row = {
                         **base_info,
                         "Contest Rank": contest_stats.get("rank", "Absent") if contest_stats else "Absent",
-                        "Contest Rating": contest_stats.get("rating", "Absent") if contest_stats else "Absent",
+                        "Rating After": contest_stats.get("newRating", "Absent") if contest_stats else "Absent",
+                        "Rating Change": (contest_stats.get("newRating", 0) - contest_stats.get("oldRating", 0)) if contest_stats else "-",
                         "Current Rating": stats.get("rating", 0),
-                        "Global Rank": stats.get("global_rank", "N/A"),
                         "Total Solved": stats.get("solved", 0)
                     }
-                else:
-                    # Default/HackerRank
-                     row = {
-                        **base_info,
-                        "Badges": stats.get("badges", 0),
-                        "Solved": stats.get("solved", 0)
-                    }
+                    
+            elif selected_platform == "codechef":
+                 contest_stats = results.get(s.get("reg_no"))
                 
-                data.append(row)
-
-            if not data:
-                # Handle empty data case with default columns to avoid crash
-                if selected_platform == "leetcode":
-                    cols = ["S. No", "Register Number", "Name of the Student", "Leet Code Easy", "Leet Code Medium", "Leet code Hard", "Total", "Contest count", "Contest Rating", "Global Rank", "Top %"]
-                elif selected_platform == "codeforces":
-                    cols = ["S. No", "Register Number", "Name of the Student", "Contest Rank", "Rating After", "Rating Change", "Current Rating", "Total Solved"]
-                elif selected_platform == "codechef":
-                    cols = ["S. No", "Register Number", "Name of the Student", "Contest Rank", "Contest Rating", "Current Rating", "Global Rank", "Total Solved"]
-                else:
-                    cols = ["S. No", "Register Number", "Name of the Student", "Badges", "Solved"]
-                df = pd.DataFrame(columns=cols)
+                 row = {
+                    **base_info,
+                    "Contest Rank": contest_stats.get("rank", "Absent") if contest_stats else "Absent",
+                    "Contest Rating": contest_stats.get("rating", "Absent") if contest_stats else "Absent",
+                    "Current Rating": stats.get("rating", 0),
+                    "Global Rank": stats.get("global_rank", "N/A"),
+                    "Total Solved": stats.get("solved", 0)
+                }
             else:
-                df = pd.DataFrame(data)
-            
-            # Use openpyxl for custom header
-            with pd.ExcelWriter(output, engine='openpyxl') as writer:
-                # Write data starting from row 3 (leaving room for header)
-                df.to_excel(writer, index=False, sheet_name='Contest Data', startrow=2)
-                
-                workbook = writer.book
-                worksheet = writer.sheets['Contest Data']
-                
-                # Add Big Date Header
-                from openpyxl.styles import Font, Alignment
-                
-                # Merge first row
-                worksheet.merge_cells(start_row=1, start_column=1, end_row=1, end_column=len(df.columns))
-                cell = worksheet.cell(row=1, column=1)
-                cell.value = contest_date if contest_date else datetime.now().strftime("%d-%m-%Y")
-                cell.font = Font(size=24, bold=True)
-                cell.alignment = Alignment(horizontal='center', vertical='center')
-                
-                # Adjust column widths
-                from openpyxl.utils import get_column_letter
-                for i, col in enumerate(worksheet.columns, 1):
-                    max_length = 0
-                    column_letter = get_column_letter(i)
-                    for cell in col:
-                        try:
-                            if len(str(cell.value)) > max_length:
-                                max_length = len(str(cell.value))
-                        except:
-                            pass
-                    adjusted_width = (max_length + 2)
-                    worksheet.column_dimensions[column_letter].width = adjusted_width
-
-            output.seek(0)
-            return output
-
-        # --- Normal Export Mode (Multi-sheet) ---
-        
-        # Prepare lists for each sheet
-        lc_data = []
-        cf_data = []
-        cc_data = []
-        hr_data = []
-        
-        for idx, s in enumerate(students, 1):
-            base_info = {
-                "S.No": idx,
-                "Reg No": s.get("reg_no", "Unknown"),
-                "Name": s.get("name", "Unknown"),
-                "Department": s.get("department", "Unknown")
-            }
-            stats = s.get("stats", {})
-            
-            # LeetCode Row
-            lc = stats.get("leetcode", {})
-            lc_row = {
-                **base_info,
-                "LeetCode Easy": lc.get("easy", 0),
-                "LeetCode Medium": lc.get("medium", 0),
-                "LeetCode Hard": lc.get("hard", 0),
-                "Total Solved": lc.get("total_solved", 0),
-                "Contest Count": lc.get("attended", 0),
-                "Contest Rating": lc.get("rating", "N/A"),
-                "Global Rank": lc.get("global_rank", "N/A"),
-                "Top %": f"{lc.get('top_percentage', 0)}%" if lc.get('top_percentage') else "N/A"
-            }
-            lc_data.append(lc_row)
-            
-            # CodeChef Row
-            cc = stats.get("codechef", {})
-            cc_row = {
-                **base_info,
-                "Rating": cc.get("rating", 0),
-                "Global Rank": cc.get("global_rank", "N/A"),
-                "Stars": cc.get("stars", 0),
-                "Solved": cc.get("solved", 0),
-                "Contests": cc.get("contests", 0)
-            }
-            cc_data.append(cc_row)
-            
-            # Codeforces Row
-            cf = stats.get("codeforces", {})
-            cf_row = {
-                **base_info,
-                "Rating": cf.get("rating", 0),
-                "Max Rating": cf.get("max_rating", 0),
-                "Rank": cf.get("rank", "Unrated"),
-                "Total Solved": cf.get("solved", 0),
-                "Contests": cf.get("contests", 0)
-            }
-            cf_data.append(cf_row)
-            
-            # HackerRank Row
-            hr = stats.get("hackerrank", {})
-            hr_row = {
-                **base_info,
-                "Badges": hr.get("badges", 0),
-                "Solved": hr.get("solved", 0)
-            }
-            hr_data.append(hr_row)
+                # Default/HackerRank
+                 row = {
+                    **base_info,
+                    "Badges": stats.get("badges", 0),
+                    "Solved": stats.get("solved", 0)
+                }
             
-        # Create DataFrames
-        df_lc = pd.DataFrame(lc_data)
-        df_cc = pd.DataFrame(cc_data)
-        df_cf = pd.DataFrame(cf_data)
-        df_hr = pd.DataFrame(hr_data)
-        
-        # Write to Excel
-        with pd.ExcelWriter(output, engine='openpyxl') as writer:
-            if not df_lc.empty:
-                df_lc.to_excel(writer, index=False, sheet_name='LeetCode')
-            else:
-                 pd.DataFrame(columns=["S.No", "Name", "Department"]).to_excel(writer, index=False, sheet_name='LeetCode')
-                 
-            if not df_cc.empty:
-                df_cc.to_excel(writer, index=False, sheet_name='CodeChef')
-            else:
-                pd.DataFrame(columns=["S.No", "Name", "Department"]).to_excel(writer, index=False, sheet_name='CodeChef')
+            data.append(row)
 
-            if not df_cf.empty:
-                df_cf.to_excel(writer, index=False, sheet_name='Codeforces')
-            else:
-                 pd.DataFrame(columns=["S.No", "Name", "Department"]).to_excel(writer, index=False, sheet_name='Codeforces')
+        if data:
+            # Union of row keys in first-seen order, as a DataFrame built from the rows would have
+            cols = list(dict.fromkeys(key for row in data for key in row))
+            return cols, data, contest
 
-            if not df_hr.empty:
-                df_hr.to_excel(writer, index=False, sheet_name='HackerRank')
-            else:
-                 pd.DataFrame(columns=["S.No", "Name", "Department"]).to_excel(writer, index=False, sheet_name='HackerRank')
-            
-        output.seek(0)
-        return output
+        # Handle empty data case with default columns
+        if selected_platform == "leetcode":
+            cols = ["S. No", "Register Number", "Name of the Student", "Leet Code Easy", "Leet Code Medium", "Leet code Hard", "Total", "Contest count", "Contest Rating", "Global Rank", "Top %"]
+        elif selected_platform == "codeforces":
+            cols = ["S. No", "Register Number", "Name of the Student", "Contest Rank", "Rating After", "Rating Change", "Current Rating", "Total Solved"]
+        elif selected_platform == "codechef":
+            cols = ["S. No", "Register Number", "Name of the Student", "Contest Rank", "Contest Rating", "Current Rating", "Global Rank", "Total Solved"]
+        else:
+            cols = ["S. No", "Register Number", "Name of the Student", "Badges", "Solved"]
+        return cols, data, contest
+
+    @staticmethod
+    async def contest_report(department: str = None, year: int = None, platform: str = None, contest_name: str = None):
+        """Returns (columns, rows, resolved contest) of the contest report for the selected students."""
+        students = await ExportService.students_cursor(department, year).to_list()
+        return await ExportService.contest_rows(students, platform, contest_name)
+
+    @staticmethod
+    async def contest_frame(department: str = None, year: int = None, platform: str = None, contest_name: str = None):
+        """The contest report as a DataFrame, for callers that merge reports."""
+        cols, rows, _ = await ExportService.contest_report(department, year, platform, contest_name)
+        return pd.DataFrame(rows, columns=cols)
+
+    @staticmethod
+    async def report_records(department: str = None, year: int = None, platform: str = None, contest_name: str = None):
+        """
+        Returns (columns, async iterator of rows) for the csv/parquet/ndjson exports:
+        the contest report when platform and contest_name are given, otherwise one
+        wide performance row per student read straight off the cursor.
+        """
+        if platform and contest_name:
+            cols, rows, _ = await ExportService.contest_report(department, year, platform, contest_name)
+
+            async def contest_records():
+                for row in rows:
+                    yield row
+            return cols, contest_records()
+
+        cursor = ExportService.students_cursor(department, year)
+
+        async def performance_records():
+            idx = 1
+            async for student in cursor:
+                yield ExportService.performance_record(idx, student)
+                idx += 1
+        return list(ExportService.performance_record(1, {}).keys()), performance_records()
+
+
+class ExportRenderer:
+    """Serializes the rows built by ExportService into the download formats."""
+
+    @staticmethod
+    async def generate_excel(department: str = None, year: int = None, platform: str = None, contest_name: str = None, contest_date: str = None):
+        """
+        Renders the performance report (or a contest report when platform and
+        contest_name are given) to a temporary .xlsx file and returns its path.
+        Pair with ExportRenderer.iter_file() to stream it out.
+        """
+        writer = XlsxStreamWriter()
+        try:
+            # --- Contest Report Mode ---
+            if platform and contest_name:
+                cols, rows, contest = await ExportService.contest_report(department, year, platform, contest_name)
+                if not contest_date and contest:
+                    # Date the contest ran, when the contests store knows it
+                    contest_date = datetime.fromtimestamp(contest["start_time"]).strftime("%d-%m-%Y")
+                title = contest_date if contest_date else datetime.now().strftime("%d-%m-%Y")
+                writer.add_sheet("Contest Data", cols, title=title)
+                for row in rows:
+                    writer.write_row("Contest Data", row)
+                return await executors.run_in_thread(writer.close)
+
+            # --- Normal Export Mode (Multi-sheet) ---
+            # Students are read straight off the cursor and written as they arrive
+            cursor = ExportService.students_cursor(department, year)
+            first = await anext(cursor, None)
+            for sheet in PERFORMANCE_SHEETS:
+                if first is None:
+                    writer.add_sheet(sheet, EMPTY_SHEET_COLUMNS)
+                else:
+                    writer.add_sheet(sheet, list(ExportService.performance_rows(1, first)[sheet].keys()))
+
+            if first is not None:
+                idx = 1
+                student = first
+                while student is not None:
+                    for sheet, row in ExportService.performance_rows(idx, student).items():
+                        writer.write_row(sheet, row)
+                    idx += 1
+                    student = await anext(cursor, None)
+
+            # Closing zips the sheets up, the expensive part; keep it off the event loop
+            return await executors.run_in_thread(writer.close)
+        except Exception:
+            try:
+                writer.workbook.close()
+            except Exception:
+                pass
+            os.remove(writer.path)
+            raise
+
+    @staticmethod
+    async def stream_csv(columns: list, records):
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=columns, extrasaction="ignore")
+        writer.writeheader()
+        async for record in records:
+            writer.writerow(record)
+            if buffer.tell() >= STREAM_CHUNK_SIZE:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+
+    @staticmethod
+    async def stream_ndjson(records):
+        async for record in records:
+            yield json.dumps(record, default=str) + "\n"
+
+    @staticmethod
+    async def generate_parquet(columns: list, records):
+        """Writes the rows to a temporary .parquet file and returns its path."""
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError("Parquet export requires pyarrow (pip install pyarrow)")
+
+        values = {column: [] for column in columns}
+        async for record in records:
+            for column in columns:
+                values[column].append(record.get(column))
+        table = pa.table({column: parquet_column(v) for column, v in values.items()})
+
+        fd, path = tempfile.mkstemp(suffix=".parquet")
+        os.close(fd)
+        await executors.run_in_thread(pq.write_table, table, path)
+        return path
+
+    @staticmethod
+    def iter_file(path: str, chunk_size: int = STREAM_CHUNK_SIZE):
+        """Yields a rendered file in chunks, then deletes it."""
+        try:
+            with open(path, "rb") as f:
+                while chunk := f.read(chunk_size):
+                    yield chunk
+        finally:
+            os.remove(path)
@@ -0,0 +1,82 @@
+from datetime import datetime
+from pymongo import UpdateOne
+from database import db
+from services.contest_results import ContestResults
+
+# Platforms whose profiles carry a rating history
+HISTORY_PLATFORMS = ("leetcode", "codeforces", "codechef")
+
+class RatingHistory:
+    """
+    Rating histories live in `rating_history`, one document per (reg_no, platform),
+    so `students` documents only hold the summary counters every read needs.
+    """
+
+    @staticmethod
+    def split(stats: dict):
+        """
+        Returns (stats without histories, {platform: history}). Platforms whose profile
+        has no "history" key (e.g. reused from the previous refresh) are left out of
+        the second dict so their stored history isn't overwritten.
+        """
+        summary, histories = {}, {}
+        for platform, data in (stats or {}).items():
+            if isinstance(data, dict) and "history" in data:
+                data = dict(data)
+                histories[platform] = data.pop("history") or []
+            summary[platform] = data
+        return summary, histories
+
+    @staticmethod
+    async def save(reg_no: str, histories: dict):
+        if not histories:
+            return
+        now = datetime.utcnow()
+        operations = [
+            UpdateOne(
+                {"reg_no": reg_no, "platform": platform},
+                {"$set": {"entries": entries, "updated_at": now, "results_indexed": True}},
+                upsert=True
+            )
+            for platform, entries in histories.items()
+        ]
+        await db.get_async_db()["rating_history"].bulk_write(operations, ordered=False)
+        await ContestResults.index(reg_no, histories)
+
+    @staticmethod
+    async def load(reg_nos: list, platform: str):
+        """Returns {reg_no: entries} for one platform."""
+        cursor = db.get_async_db()["rating_history"].find(
+            {"platform": platform, "reg_no": {"$in": list(reg_nos)}},
+            {"_id": 0, "reg_no": 1, "entries": 1}
+        )
+        return {doc["reg_no"]: doc.get("entries", []) for doc in await cursor.to_list()}
+
+    @staticmethod
+    async def attach(student: dict):
+        """Puts the stored histories back under stats.<platform>.history on a student document."""
+        cursor = db.get_async_db()["rating_history"].find({"reg_no": student["reg_no"]})
+        stats = student.setdefault("stats", {}) or {}
+        for doc in await cursor.to_list():
+            if isinstance(stats.get(doc["platform"]), dict):
+                stats[doc["platform"]]["history"] = doc.get("entries", [])
+        return student
+
+    @staticmethod
+    async def migrate_embedded():
+        """Moves histories still embedded in `students` documents into `rating_history`."""
+        fields = [f"stats.{p}.history" for p in HISTORY_PLATFORMS]
+        query = {"$or": [{f: {"$exists": True}} for f in fields]}
+        projection = {"reg_no": 1, **{f: 1 for f in fields}}
+
+        moved = 0
+        async for student in db.get_async_db()["students"].find(query, projection):
+            _, histories = RatingHistory.split(student.get("stats"))
+            await RatingHistory.save(student["reg_no"], histories)
+            await db.get_async_db()["students"].update_one(
+                {"_id": student["_id"]},
+                {"$unset": {f: "" for f in fields}}
+            )
+            moved += 1
+        if moved:
+            print(f"Moved embedded rating history for {moved} students into rating_history")
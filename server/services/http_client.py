@@ -0,0 +1,138 @@
+import asyncio
+import importlib.util
+import os
+import time
+import httpx
+from .cache import response_cache
+from .rate_limit import buckets, retry_delay, RETRY_STATUSES, MAX_RETRIES
+
+# Upstream host used by each platform service. One pooled client is kept per host
+# so repeated requests reuse keep-alive connections instead of new TCP+TLS handshakes.
+PLATFORM_HOSTS = {
+    "leetcode": "leetcode.com",
+    "codeforces": "codeforces.com",
+    "codechef": "www.codechef.com",
+    "hackerrank": "www.hackerrank.com",
+    "atcoder": "kenkoooo.com",
+}
+
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "20"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "10"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "60"))
+
+# HTTP/2 needs the optional `h2` package; without it we stay on HTTP/1.1 keep-alive
+HTTP2_ENABLED = os.getenv("HTTP2_ENABLED", "1") == "1" and importlib.util.find_spec("h2") is not None
+
+
+class HttpClients:
+    """
+    Application-wide registry of pooled httpx clients, one per upstream host.
+
+    httpx clients are tied to the event loop that first used them. The API runs on
+    uvicorn's loop while the scheduler drives its own `asyncio.run`, so clients are
+    tracked per running loop and each loop closes its own set.
+    """
+
+    def __init__(self):
+        self._clients = {}
+
+    def _new_client(self):
+        limits = httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+            keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+        )
+        return httpx.AsyncClient(http2=HTTP2_ENABLED, limits=limits, timeout=10.0)
+
+    def get(self, platform: str) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        clients = self._clients.setdefault(loop, {})
+        host = PLATFORM_HOSTS[platform]
+
+        client = clients.get(host)
+        if client is None or client.is_closed:
+            client = self._new_client()
+            clients[host] = client
+        return client
+
+    async def request(self, platform: str, method: str, url: str, cache_key: str = None, **kwargs) -> httpx.Response:
+        """
+        Sends a request through the platform's pooled client, waiting for a slot in
+        its token bucket and backing off with jitter on 429/503 responses.
+
+        With a `cache_key` (see services.cache.cache_key), fresh cached responses are
+        returned without touching the upstream, and stale ones are revalidated with
+        If-None-Match / If-Modified-Since when the upstream sent validators.
+        """
+        cached = None
+        if cache_key:
+            cached = await response_cache.get(cache_key)
+            if cached and cached["expires_at"] > time.time():
+                response_cache.counters["hits"] += 1
+                return self._from_cache(cached, method, url)
+
+            if cached:
+                headers = dict(kwargs.get("headers") or {})
+                if cached["headers"].get("etag"):
+                    headers["If-None-Match"] = cached["headers"]["etag"]
+                if cached["headers"].get("last-modified"):
+                    headers["If-Modified-Since"] = cached["headers"]["last-modified"]
+                kwargs["headers"] = headers
+
+        response = await self._send(platform, method, url, **kwargs)
+        if not cache_key:
+            return response
+
+        if response.status_code == 304 and cached:
+            response_cache.counters["revalidated"] += 1
+            await response_cache.store(cache_key, platform, cached["text"], cached["status"], cached["headers"])
+            return self._from_cache(cached, method, url)
+
+        response_cache.counters["misses"] += 1
+        if response.status_code == 200:
+            validators = {
+                name: response.headers[name]
+                for name in ("etag", "last-modified", "content-type")
+                if name in response.headers
+            }
+            await response_cache.store(cache_key, platform, response.text, 200, validators)
+        return response
+
+    async def _send(self, platform: str, method: str, url: str, **kwargs) -> httpx.Response:
+        client = self.get(platform)
+        bucket = buckets[platform]
+
+        for attempt in range(MAX_RETRIES + 1):
+            await bucket.acquire()
+            response = await client.request(method, url, **kwargs)
+            if response.status_code not in RETRY_STATUSES or attempt == MAX_RETRIES:
+                return response
+
+            delay = retry_delay(response, attempt)
+            print(f"{platform} returned {response.status_code} for {url}, retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+    @staticmethod
+    def _from_cache(entry: dict, method: str, url: str) -> httpx.Response:
+        return httpx.Response(
+            status_code=entry["status"],
+            content=entry["text"].encode("utf-8"),
+            headers=entry["headers"],
+            request=httpx.Request(method, url),
+        )
+
+    async def start(self):
+        for platform in PLATFORM_HOSTS:
+            self.get(platform)
+        print(f"HTTP clients ready for {len(PLATFORM_HOSTS)} platforms (http2={HTTP2_ENABLED})")
+
+    async def close(self):
+        clients = self._clients.pop(asyncio.get_running_loop(), {})
+        for client in clients.values():
+            try:
+                await client.aclose()
+            except Exception as e:
+                print(f"Error closing HTTP client: {e}")
+
+
+http_clients = HttpClients()
@@ -0,0 +1,231 @@
+import asyncio
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from database import db
+from services.refresh import RefreshEngine
+from services.summary import DashboardSummary
+
+# Students per job. Batches keep the bulk Codeforces/LeetCode prefetch useful inside a job.
+JOB_BATCH_SIZE = int(os.getenv("JOB_BATCH_SIZE", "25"))
+# A leased job is reclaimed by another worker once its lease runs out without a heartbeat
+JOB_LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", "300"))
+JOB_HEARTBEAT_SECONDS = int(os.getenv("JOB_HEARTBEAT_SECONDS", "60"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+# Retry delay doubles per attempt: base, 2*base, 4*base... capped at JOB_BACKOFF_MAX
+JOB_BACKOFF_BASE = int(os.getenv("JOB_BACKOFF_BASE", "60"))
+JOB_BACKOFF_MAX = int(os.getenv("JOB_BACKOFF_MAX", "3600"))
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "5"))
+
+# Run a worker inside the API process too (the default, for single-box deployments)
+EMBEDDED_WORKER = os.getenv("EMBEDDED_WORKER", "1") == "1"
+WORKER_CONCURRENCY = int(os.getenv("WORKER_CONCURRENCY", "1"))
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+
+class JobQueue:
+    """
+    Refresh jobs in `refresh_jobs`. Each job holds a batch of reg_nos; workers
+    lease one at a time with an atomic find_one_and_update, keep the lease alive
+    with heartbeats, and either complete it or put it back with a backoff.
+    A job whose lease expires (worker died) is picked up again by another worker.
+    """
+
+    @staticmethod
+    async def enqueue(targets: list, run_id: str = None):
+        """
+        Splits [(reg_no, platforms)] into batch jobs under one run, in the given
+        order, and returns the run id. platforms=None refreshes every handle.
+        """
+        run_id = run_id or uuid.uuid4().hex
+        now = datetime.utcnow()
+        jobs = [
+            {
+                "run_id": run_id,
+                "reg_nos": [reg_no for reg_no, _ in batch],
+                "targets": [{"reg_no": reg_no, "platforms": platforms} for reg_no, platforms in batch],
+                "status": QUEUED,
+                "attempts": 0,
+                "run_after": now,
+                # Position within the run; jobs queued together are leased in this order
+                "priority": position,
+                "created_at": now,
+            }
+            for position, batch in enumerate(
+                targets[i:i + JOB_BATCH_SIZE] for i in range(0, len(targets), JOB_BATCH_SIZE)
+            )
+        ]
+        if jobs:
+            await db.get_async_db()["refresh_jobs"].insert_many(jobs)
+        return run_id
+
+    @staticmethod
+    async def lease(worker_id: str):
+        now = datetime.utcnow()
+        return await db.get_async_db()["refresh_jobs"].find_one_and_update(
+            {"$or": [
+                {"status": QUEUED, "run_after": {"$lte": now}},
+                {"status": RUNNING, "lease_until": {"$lt": now}},
+            ]},
+            {
+                "$set": {
+                    "status": RUNNING,
+                    "worker": worker_id,
+                    "lease_until": now + timedelta(seconds=JOB_LEASE_SECONDS),
+                    "heartbeat_at": now,
+                    "started_at": now,
+                },
+                "$inc": {"attempts": 1},
+            },
+            sort=[("run_after", 1), ("priority", 1)],
+            return_document=ReturnDocument.AFTER
+        )
+
+    @staticmethod
+    async def heartbeat(job: dict, worker_id: str) -> bool:
+        """Extends the lease. False means another worker has taken the job over."""
+        now = datetime.utcnow()
+        result = await db.get_async_db()["refresh_jobs"].update_one(
+            {"_id": job["_id"], "worker": worker_id, "status": RUNNING},
+            {"$set": {"lease_until": now + timedelta(seconds=JOB_LEASE_SECONDS), "heartbeat_at": now}}
+        )
+        return result.matched_count == 1
+
+    @staticmethod
+    async def complete(job: dict, worker_id: str, updated: int):
+        await db.get_async_db()["refresh_jobs"].update_one(
+            {"_id": job["_id"], "worker": worker_id},
+            {"$set": {"status": DONE, "updated": updated, "finished_at": datetime.utcnow()}, "$unset": {"lease_until": ""}}
+        )
+
+    @staticmethod
+    async def retry(job: dict, worker_id: str, error: str):
+        """Puts the job back with an exponential backoff, or fails it once attempts run out."""
+        now = datetime.utcnow()
+        if job["attempts"] >= JOB_MAX_ATTEMPTS:
+            fields = {"status": FAILED, "error": error, "finished_at": now}
+        else:
+            delay = min(JOB_BACKOFF_BASE * 2 ** (job["attempts"] - 1), JOB_BACKOFF_MAX)
+            fields = {"status": QUEUED, "error": error, "run_after": now + timedelta(seconds=delay)}
+        await db.get_async_db()["refresh_jobs"].update_one(
+            {"_id": job["_id"], "worker": worker_id},
+            {"$set": fields, "$unset": {"lease_until": ""}}
+        )
+
+    @staticmethod
+    async def run_finished(run_id: str) -> bool:
+        pending = await db.get_async_db()["refresh_jobs"].find_one(
+            {"run_id": run_id, "status": {"$in": [QUEUED, RUNNING]}}, {"_id": 1}
+        )
+        return pending is None
+
+    @staticmethod
+    async def pending_runs() -> list:
+        """Ids of runs with jobs still queued or running."""
+        return await db.get_async_db()["refresh_jobs"].distinct("run_id", {"status": {"$in": [QUEUED, RUNNING]}})
+
+
+class LeaderLock:
+    """
+    Expiring named locks in `locks`. acquire() succeeds for the current holder or
+    when the lock has expired; otherwise the upsert collides on _id and fails.
+    """
+
+    @staticmethod
+    async def acquire(name: str, owner: str, ttl: int) -> bool:
+        now = datetime.utcnow()
+        try:
+            await db.get_async_db()["locks"].find_one_and_update(
+                {"_id": name, "$or": [{"expires_at": {"$lt": now}}, {"owner": owner}]},
+                {"$set": {"owner": owner, "expires_at": now + timedelta(seconds=ttl)}},
+                upsert=True
+            )
+            return True
+        except DuplicateKeyError:
+            return False
+
+
+def worker_name():
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+
+class RefreshWorker:
+    """
+    Leases refresh jobs and runs them through RefreshEngine. Run any number of
+    these (python worker.py, or the embedded one in the API) to shard a sync.
+    """
+
+    def __init__(self, worker_id: str = None, concurrency: int = WORKER_CONCURRENCY):
+        self.worker_id = worker_id or worker_name()
+        self.concurrency = concurrency
+        self._stopping = asyncio.Event()
+        self._tasks = []
+
+    async def _keep_alive(self, job: dict):
+        while True:
+            await asyncio.sleep(JOB_HEARTBEAT_SECONDS)
+            if not await JobQueue.heartbeat(job, self.worker_id):
+                print(f"[{self.worker_id}] lost the lease on job {job['_id']}")
+                return
+
+    async def run_job(self, job: dict):
+        if job["attempts"] > JOB_MAX_ATTEMPTS:
+            # Reclaimed after its worker died one time too many
+            await JobQueue.retry(job, self.worker_id, "lease expired")
+            return
+
+        heartbeat = asyncio.create_task(self._keep_alive(job))
+        try:
+            students = await db.get_async_db()["students"].find({"reg_no": {"$in": job["reg_nos"]}}).to_list()
+            platforms = {t["reg_no"]: t["platforms"] for t in job.get("targets", [])}
+            # The summary is rebuilt once per run below, not once per batch
+            updated = await RefreshEngine.refresh_students(students, rebuild_summary=False, platforms=platforms)
+        except Exception as e:
+            print(f"[{self.worker_id}] job {job['_id']} failed (attempt {job['attempts']}): {e}")
+            await JobQueue.retry(job, self.worker_id, str(e))
+            return
+        finally:
+            heartbeat.cancel()
+
+        await JobQueue.complete(job, self.worker_id, updated)
+        print(f"[{self.worker_id}] job {job['_id']}: updated {updated}/{len(job['reg_nos'])} students")
+
+        if await JobQueue.run_finished(job["run_id"]):
+            try:
+                await DashboardSummary.rebuild()
+            except Exception as e:
+                print(f"Failed to rebuild dashboard summary: {e}")
+
+    async def _loop(self):
+        while not self._stopping.is_set():
+            try:
+                job = await JobQueue.lease(self.worker_id)
+            except Exception as e:
+                print(f"[{self.worker_id}] lease error: {e}")
+                job = None
+            if job is None:
+                try:
+                    await asyncio.wait_for(self._stopping.wait(), JOB_POLL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await self.run_job(job)
+
+    async def run(self):
+        print(f"Refresh worker {self.worker_id} started ({self.concurrency} slots)")
+        await asyncio.gather(*(self._loop() for _ in range(self.concurrency)))
+
+    def start(self):
+        """Runs the worker as a background task of the current event loop."""
+        self._tasks = [asyncio.create_task(self.run())]
+
+    async def stop(self):
+        # Jobs in flight finish; an abandoned lease would otherwise sit until it expires
+        self._stopping.set()
+        for task in self._tasks:
+            await task
+        self._tasks = []
@@ -0,0 +1,191 @@
+import heapq
+import os
+from datetime import datetime, timedelta, timezone
+from pymongo import DeleteOne, UpdateOne
+from database import db
+from services.contests import ContestService
+
+# Platforms a student can have a handle on, i.e. the units the planner schedules
+REFRESH_PLATFORMS = ("leetcode", "codeforces", "codechef", "hackerrank")
+
+# Fields that move only when the student does something (solves, competes), per
+# platform. Ranks and last-online drift on their own and don't count as activity.
+ACTIVITY_FIELDS = {
+    "leetcode": ("total_solved", "attended", "rating"),
+    "codeforces": ("solved", "contests", "rating"),
+    "codechef": ("solved", "contests", "rating"),
+    "hackerrank": ("solved", "badges"),
+}
+
+# Outcomes of refreshing one platform of a student, as passed to RefreshPlan.record()
+ACTIVE, UNCHANGED, FAILED, NOT_FOUND = "active", "unchanged", "failed", "not_found"
+
+# Refresh interval by how recently a handle last showed activity
+PLAN_ACTIVE_SECONDS = int(os.getenv("PLAN_ACTIVE_SECONDS", str(3 * 3600)))
+PLAN_IDLE_SECONDS = int(os.getenv("PLAN_IDLE_SECONDS", str(6 * 3600)))
+PLAN_INACTIVE_SECONDS = int(os.getenv("PLAN_INACTIVE_SECONDS", str(24 * 3600)))
+PLAN_ACTIVE_DAYS = int(os.getenv("PLAN_ACTIVE_DAYS", "7"))
+PLAN_INACTIVE_DAYS = int(os.getenv("PLAN_INACTIVE_DAYS", "30"))
+# Active handles are refreshed this long after a contest on their platform ends, once ratings are out
+PLAN_CONTEST_DELAY = int(os.getenv("PLAN_CONTEST_DELAY", str(2 * 3600)))
+# A failed fetch is tried again sooner than its normal interval
+PLAN_RETRY_SECONDS = int(os.getenv("PLAN_RETRY_SECONDS", "3600"))
+# Upper bound on (student, platform) pairs queued per planner tick
+PLAN_MAX_PER_TICK = int(os.getenv("PLAN_MAX_PER_TICK", "2000"))
+
+
+def is_active(platform: str, old: dict, new: dict) -> bool:
+    """Whether the activity fields moved between two snapshots of a platform's stats."""
+    old = old or {}
+    return any(old.get(f) != new.get(f) for f in ACTIVITY_FIELDS.get(platform, ()))
+
+
+def refresh_interval(last_changed, now: datetime) -> int:
+    """Seconds until the next refresh of a handle whose stats last changed at `last_changed`."""
+    if last_changed is None or now - last_changed > timedelta(days=PLAN_INACTIVE_DAYS):
+        return PLAN_INACTIVE_SECONDS
+    if now - last_changed <= timedelta(days=PLAN_ACTIVE_DAYS):
+        return PLAN_ACTIVE_SECONDS
+    return PLAN_IDLE_SECONDS
+
+
+class RefreshPlan:
+    """
+    Next-due times per (reg_no, platform) in `refresh_plan`. Each refresh records
+    whether the handle showed activity; the next due time follows from how
+    active the handle is and when the next contest on that platform ends.
+    The scheduler queues whatever is due, most urgent first; a queued pair
+    carries its run id (`queued_run`) and isn't queued again until its job
+    records a result or the run is over.
+    """
+
+    @staticmethod
+    async def contest_ends(now: datetime) -> dict:
+        """{platform: sorted end times} of stored contests ending within the inactive interval."""
+        now_ts = now.replace(tzinfo=timezone.utc).timestamp()
+        # Contests that started up to a day ago may still be running
+        contests = await ContestService.get_range(now_ts - 86400, now_ts + PLAN_INACTIVE_SECONDS, limit=1000)
+        ends = {}
+        for c in contests:
+            end = c.get("start_time", 0) + (c.get("duration") or 0)
+            if end + PLAN_CONTEST_DELAY > now_ts:
+                ends.setdefault(c["platform"].lower(), []).append(end)
+        return {p: sorted(e) for p, e in ends.items()}
+
+    @staticmethod
+    def next_due(platform: str, last_changed, now: datetime, ends: dict):
+        """Returns (next due time, whether it was pulled in by a contest)."""
+        interval = refresh_interval(last_changed, now)
+        due = now + timedelta(seconds=interval)
+        if interval == PLAN_INACTIVE_SECONDS:
+            return due, False
+        for end in ends.get(platform, []):
+            after = datetime.fromtimestamp(end + PLAN_CONTEST_DELAY, timezone.utc).replace(tzinfo=None)
+            if now < after < due:
+                return after, True
+        return due, False
+
+    @staticmethod
+    async def record(reg_no: str, outcomes: dict, ends: dict, now: datetime = None):
+        """
+        Schedules the next refresh of each platform just refreshed for a student.
+        `outcomes` maps platform -> ACTIVE, UNCHANGED, FAILED (retried soon) or
+        NOT_FOUND (the handle doesn't exist; checked again at the inactive interval).
+        """
+        if not outcomes:
+            return
+        now = now or datetime.utcnow()
+        collection = db.get_async_db()["refresh_plan"]
+        existing = {
+            doc["platform"]: doc
+            for doc in await collection.find({"reg_no": reg_no, "platform": {"$in": list(outcomes)}}).to_list()
+        }
+
+        operations = []
+        for platform, outcome in outcomes.items():
+            last_changed = now if outcome == ACTIVE else existing.get(platform, {}).get("last_changed")
+            fields = {"last_checked": now}
+            if outcome == ACTIVE:
+                fields["last_changed"] = now
+            if outcome == FAILED:
+                fields["next_due"], fields["contest"] = now + timedelta(seconds=PLAN_RETRY_SECONDS), False
+            elif outcome == NOT_FOUND:
+                fields["next_due"], fields["contest"] = now + timedelta(seconds=PLAN_INACTIVE_SECONDS), False
+            else:
+                fields["next_due"], fields["contest"] = RefreshPlan.next_due(platform, last_changed, now, ends)
+            operations.append(UpdateOne(
+                {"reg_no": reg_no, "platform": platform},
+                {"$set": fields, "$unset": {"queued_run": "", "queued_at": ""}},
+                upsert=True
+            ))
+        await collection.bulk_write(operations, ordered=False)
+
+    @staticmethod
+    async def seed(now: datetime):
+        """Adds pairs for new handles (due immediately) and drops pairs whose handle was removed."""
+        students = await db.get_async_db()["students"].find({}, {"_id": 0, "reg_no": 1, "handles": 1}).to_list()
+        wanted = {
+            (s["reg_no"], p)
+            for s in students
+            for p in REFRESH_PLATFORMS
+            if (s.get("handles") or {}).get(p)
+        }
+        collection = db.get_async_db()["refresh_plan"]
+        planned = {(d["reg_no"], d["platform"]) for d in await collection.find({}, {"_id": 0, "reg_no": 1, "platform": 1}).to_list()}
+
+        added = [
+            UpdateOne({"reg_no": r, "platform": p}, {"$setOnInsert": {"next_due": now, "contest": False}}, upsert=True)
+            for r, p in wanted - planned
+        ]
+        removed = [DeleteOne({"reg_no": r, "platform": p}) for r, p in planned - wanted]
+        if added or removed:
+            await collection.bulk_write(added + removed, ordered=False)
+        return len(added)
+
+    @staticmethod
+    async def release(pending_runs: list, now: datetime = None):
+        """
+        Makes pairs whose run has no pending jobs left plannable again. A pair
+        still queued then never got a result recorded (its job failed for good),
+        so it is retried like a failed fetch.
+        """
+        now = now or datetime.utcnow()
+        result = await db.get_async_db()["refresh_plan"].update_many(
+            {"queued_run": {"$exists": True, "$nin": list(pending_runs)}},
+            {
+                "$set": {"next_due": now + timedelta(seconds=PLAN_RETRY_SECONDS), "contest": False},
+                "$unset": {"queued_run": "", "queued_at": ""},
+            }
+        )
+        return result.modified_count
+
+    @staticmethod
+    async def take_due(run_id: str, now: datetime = None, limit: int = PLAN_MAX_PER_TICK):
+        """
+        Pops the due pairs off a priority queue (contest follow-ups first, then the
+        most overdue) and returns [(reg_no, [platforms])] in that order. Each
+        student appears once, at the position of its most urgent platform. The
+        returned pairs are marked as queued under `run_id` until refreshed.
+        """
+        now = now or datetime.utcnow()
+        collection = db.get_async_db()["refresh_plan"]
+        due = await collection.find(
+            {"next_due": {"$lte": now}, "queued_run": {"$exists": False}},
+            {"_id": 1, "reg_no": 1, "platform": 1, "next_due": 1, "contest": 1},
+            sort=[("next_due", 1)],
+            limit=limit
+        ).to_list()
+
+        queue = [(0 if d.get("contest") else 1, d["next_due"], d["reg_no"], d["platform"]) for d in due]
+        heapq.heapify(queue)
+        targets = {}
+        while queue:
+            _, _, reg_no, platform = heapq.heappop(queue)
+            targets.setdefault(reg_no, []).append(platform)
+
+        if due:
+            await collection.update_many(
+                {"_id": {"$in": [d["_id"] for d in due]}},
+                {"$set": {"queued_run": run_id, "queued_at": now}}
+            )
+        return list(targets.items())
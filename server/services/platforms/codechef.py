@@ -1,6 +1,99 @@
+import json
 import re
-import httpx
-from bs4 import BeautifulSoup
+from ..http_client import http_clients
+from ..cache import response_cache, cache_key
+from ..executors import executors
+
+# Only these fragments of the (large) profile page are looked at; see parse_profile()
+RATING_NUMBER_RE = re.compile(r'class="rating-number"[^>]*>\s*(\d+)')
+HIGHEST_RATING_RE = re.compile(r"Highest Rating (\d+)")
+STARS_RE = re.compile(r'<span class="rating"[^>]*>([^<]*)</span>')
+RANK_LINK_RE = re.compile(r'<a[^>]*href="([^"]*)"[^>]*>(.*?)</a>', re.DOTALL)
+SOLVED_RE = re.compile(r"Total Problems Solved:?\s*(\d+)", re.IGNORECASE)
+CONTESTS_RE = re.compile(r"Contests Participated:?\s*(\d+)", re.IGNORECASE)
+HISTORY_RE = re.compile(r"var all_rating = (\[.*?\]);", re.DOTALL)
+TAG_RE = re.compile(r"<[^>]+>")
+
+# Characters kept after a block's start marker; the blocks are a few hundred bytes
+FRAGMENT_SIZE = 3000
+
+def fragment(html: str, marker: str, size: int = FRAGMENT_SIZE) -> str:
+    start = html.find(marker)
+    return html[start:start + size] if start != -1 else ""
+
+def number_after(html: str, label: str, pattern, size: int = 300) -> int:
+    """
+    Reads the number following a label, tags stripped so "<b>Label:</b> <b>12</b>"
+    reads "Label: 12". Tries each occurrence of the label until one matches.
+    """
+    start = html.find(label)
+    while start != -1:
+        match = pattern.match(" ".join(TAG_RE.sub(" ", html[start:start + size]).split()))
+        if match:
+            return int(match.group(1))
+        start = html.find(label, start + 1)
+    return 0
+
+def parse_profile(html: str) -> dict:
+    """
+    Extracts the profile numbers from a CodeChef profile page without building a DOM.
+    Pure and CPU-only, so it can run in the process pool.
+    """
+    header = fragment(html, 'class="rating-header')
+    match = RATING_NUMBER_RE.search(header)
+    rating = int(match.group(1)) if match else 0
+    match = HIGHEST_RATING_RE.search(header)
+    max_rating = int(match.group(1)) if match else 0
+
+    stars = 0
+    match = STARS_RE.search(html)
+    if match and "★" in match.group(1):
+        stars_text = match.group(1).replace("★", "").strip()
+        if stars_text.isdigit():
+            stars = int(stars_text)
+
+    global_rank, country_rank = 0, 0
+    for href, label in RANK_LINK_RE.findall(fragment(html, 'class="rating-ranks"')):
+        value = TAG_RE.sub("", label).strip()
+        if not value.isdigit():
+            continue
+        if "global" in href and not global_rank:
+            global_rank = int(value)
+        elif "country" in href and not country_rank:
+            country_rank = int(value)
+
+    solved = number_after(html, "Total Problems Solved", SOLVED_RE)
+    contests = number_after(html, "Contests Participated", CONTESTS_RE)
+
+    # History (script tag)
+    history = []
+    match = HISTORY_RE.search(html)
+    if match:
+        try:
+            history = json.loads(match.group(1))
+        except ValueError as he:
+            print(f"CC History parse error: {he}")
+
+    return {
+        "rating": rating,
+        "stars": stars,
+        "global_rank": global_rank,
+        "country_rank": country_rank,
+        "max_rating": max_rating,
+        "solved": solved,
+        "contests": contests,
+        "history": history,
+    }
+
+def division_for(rating: int) -> str:
+    # Div 1: 2000+, Div 2: 1600-1999, Div 3: <1600 (Approx rules)
+    if rating >= 2000:
+        return "Div 1"
+    elif rating >= 1600:
+        return "Div 2"
+    elif rating > 0:
+        return "Div 3"
+    return "Unrated"
 
 class CodeChefService:
     @staticmethod
@@ -9,108 +102,26 @@ class CodeChefService:
         headers = {
             "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
         }
-        
-        async with httpx.AsyncClient() as client:
-            try:
-                response = await client.get(url, headers=headers, timeout=15.0)
+
+        # The parsed numbers are cached, not the ~200 KB page they come from
+        key = cache_key("codechef", username, "parsed")
+        try:
+            parsed = await response_cache.get_json(key)
+            if parsed is None:
+                response = await http_clients.request("codechef", "GET", url, headers=headers, timeout=15.0)
                 if response.status_code != 200:
                     return None
-                
-                soup = BeautifulSoup(response.content, "html.parser")
-                text_content = soup.get_text()
-
-                # Basic Rating
-                rating_header = soup.find("div", class_="rating-header")
-                rating_val = 0
-                if rating_header:
-                    rating_tag = rating_header.find("div", class_="rating-number")
-                    if rating_tag:
-                         rating_val = int(rating_tag.text.strip())
-                
-                # Stars
-                stars = 0
-                star_tag = soup.find("span", class_="rating")
-                if star_tag:
-                    if "★" in star_tag.text:
-                        stars_text = star_tag.text.replace("★", "").strip()
-                        if stars_text.isdigit():
-                            stars = int(stars_text)
-                
-                # Global Rank
-                global_rank = 0
-                ranks = soup.find("div", class_="rating-ranks")
-                if ranks:
-                    global_rank_tag = ranks.find("a", href=lambda x: x and "global" in x)
-                    if global_rank_tag:
-                        global_rank = int(global_rank_tag.text.strip())
-
-                # Max Rating
-                max_rating = 0
-                max_rating_header = soup.find("div", class_="rating-header")
-                if max_rating_header:
-                    small_tag = max_rating_header.find("small")
-                    if small_tag:
-                         match_max = re.search(r"Highest Rating (\d+)", small_tag.text)
-                         if match_max:
-                             max_rating = int(match_max.group(1))
-
-                # Country Rank
-                country_rank = 0
-                ranks = soup.find("div", class_="rating-ranks")
-                if ranks:
-                    country_rank_tag = ranks.find("a", href=lambda x: x and "country" in x)
-                    if country_rank_tag:
-                        country_rank = int(country_rank_tag.text.strip())
-
-                # Division (Inferred from Rating if not explicitly found, but let's try scraping)
-                # Div 1: 2000+, Div 2: 1600-1999, Div 3: <1600 (Approx rules, or scrape div tag)
-                division = "N/A"
-                if rating_val >= 2000:
-                    division = "Div 1"
-                elif rating_val >= 1600:
-                    division = "Div 2"
-                elif rating_val > 0:
-                    division = "Div 3"
-                elif rating_val == 0:
-                     division = "Unrated"
-
-                # Total Solved (Regex)
-                solved = 0
-                match_solved = re.search(r"Total Problems Solved:?\s*(\d+)", text_content, re.IGNORECASE)
-                if match_solved:
-                    solved = int(match_solved.group(1))
-
-                # Contests Participated (Regex)
-                contests = 0
-                match_contest = re.search(r"No\.? of Contests Participated:?\s*(\d+)", text_content, re.IGNORECASE)
-                if not match_contest:
-                     match_contest = re.search(r"Contests Participated:?\s*(\d+)", text_content, re.IGNORECASE)
-                if match_contest:
-                    contests = int(match_contest.group(1))
 
-                # History (Scrape script tag)
-                history = []
-                try:
-                    match_history = re.search(r"var all_rating = (\[.*?\]);", response.text, re.DOTALL)
-                    if match_history:
-                        import json
-                        history = json.loads(match_history.group(1))
-                except Exception as he:
-                    print(f"CC History parse error: {he}")
+                # Parsing is CPU work; it runs in the process pool, off the event loop and the GIL
+                parsed = await executors.run_in_process(parse_profile, response.text)
+                await response_cache.store_json(key, "codechef", parsed)
 
-                return {
-                    "platform": "CodeChef",
-                    "username": username,
-                    "rating": rating_val,
-                    "stars": stars,
-                    "global_rank": global_rank,
-                    "country_rank": country_rank,
-                    "max_rating": max_rating,
-                    "division": division,
-                    "solved": solved,
-                    "contests": contests,
-                    "history": history
-                }
-            except Exception as e:
-                print(f"Error fetching CodeChef for {username}: {e}")
-                return None
+            return {
+                "platform": "CodeChef",
+                "username": username,
+                **parsed,
+                "division": division_for(parsed["rating"]),
+            }
+        except Exception as e:
+            print(f"Error fetching CodeChef for {username}: {e}")
+            return None
@@ -1,29 +1,161 @@
-import httpx
+import asyncio
+import hashlib
+import json
+import time
+from ..http_client import http_clients
+from ..cache import response_cache, cache_key
+from ..executors import executors
+from ..contests import ContestService
+from database import db
+from datetime import datetime
+from pymongo import ReturnDocument
 import re
 
 CODEFORCES_USER_URL = "https://codeforces.com/api/user.info"
+# Handles per user.info call; the API accepts hundreds separated by semicolons
+CODEFORCES_INFO_CHUNK = 300
+# user.status page sizes: small pages for incremental syncs, large ones for a handle's first sync
+CODEFORCES_STATUS_PAGE = 100
+CODEFORCES_STATUS_FIRST_PAGE = 10000
+# contest.standings: handles per call, calls in flight, and how long final standings stay cached
+CODEFORCES_STANDINGS_CHUNK = 100
+CODEFORCES_STANDINGS_CONCURRENCY = 4
+CODEFORCES_FINAL_STANDINGS_TTL = 30 * 24 * 3600
+# Contests that ended this recently may not be rated yet, so a user.rating fetch doesn't count as covering them
+CODEFORCES_RATING_SETTLE = 6 * 3600
+
+def scan_submissions(submissions: list, high_water: int):
+    """
+    Scans one user.status page, newest first, down to the high-water mark.
+    Returns (solved problem keys, newest id seen, oldest id still being judged, reached_mark).
+    """
+    solved_problems = set()
+    newest = high_water
+    oldest_pending = None
+    for sub in submissions:
+        if sub["id"] <= high_water:
+            return solved_problems, newest, oldest_pending, True
+        newest = max(newest, sub["id"])
+
+        verdict = sub.get("verdict")
+        if verdict is None or verdict == "TESTING":
+            oldest_pending = sub["id"] if oldest_pending is None else min(oldest_pending, sub["id"])
+        elif verdict == "OK":
+            # Create a unique key for the problem (contestId + index)
+            problem = sub.get("problem", {})
+            if "contestId" in problem and "index" in problem:
+                solved_problems.add(f"{problem['contestId']}-{problem['index']}")
+            # Fallback for old problems or problems without contest ID (rare)
+            elif "name" in problem:
+                solved_problems.add(problem["name"])
+    return solved_problems, newest, oldest_pending, False
+
+async def missed_contest(previous: dict, last_online: int) -> bool:
+    """
+    Whether the user was online after the start of a stored Codeforces contest that
+    ended since user.rating was last fetched. Catches rated contests that left the
+    rating unchanged (a 0 delta), which the rating comparison alone misses.
+    """
+    checked = previous.get("rating_checked", 0)
+    if last_online <= checked:
+        return False
+    contests = await ContestService.get_range(checked - 86400, last_online + 1, platform="codeforces", limit=1000)
+    return any(c["start_time"] + (c.get("duration") or 0) > checked for c in contests)
+
+def without_missing_handle(handles: list, data: dict):
+    """
+    One unknown handle fails a whole multi-handle call. Returns the handles to retry
+    with that one dropped, or None when the failure names no handle from the list.
+    """
+    missing = re.search(r"handle (\S+) not found", data.get("comment", ""))
+    if not missing:
+        return None
+    bad = missing.group(1).lower()
+    remaining = [h for h in handles if h.lower() != bad]
+    return remaining if len(remaining) < len(handles) else None
 
 class CodeforcesService:
     @staticmethod
-    async def get_user_profile(username: str):
-        async with httpx.AsyncClient() as client:
-            try:
-                # 1. Get User Info
-                response = await client.get(
+    async def get_user_infos(handles: list):
+        """
+        Fetches user.info for many handles in a few chunked calls.
+        Returns a dict keyed by lowercase handle, or None if Codeforces could not be reached.
+        """
+        infos = {}
+        unique = list(dict.fromkeys(h.strip() for h in handles if h and h.strip()))
+
+        for start in range(0, len(unique), CODEFORCES_INFO_CHUNK):
+            chunk = unique[start:start + CODEFORCES_INFO_CHUNK]
+            while chunk:
+                try:
+                    response = await http_clients.request("codeforces", "POST",
+                        CODEFORCES_USER_URL,
+                        data={"handles": ";".join(chunk)},
+                        timeout=30.0
+                    )
+                    data = response.json()
+                except Exception as e:
+                    print(f"Error fetching Codeforces user.info batch: {e}")
+                    return None
+
+                if data["status"] == "OK":
+                    for info in data["result"]:
+                        infos[info["handle"].lower()] = info
+                    # Seed the per-handle cache so single-user lookups right after a sync are free
+                    await response_cache.store_json_many("codeforces", {
+                        cache_key("codeforces", info["handle"], "user.info"): {"status": "OK", "result": [info]}
+                        for info in data["result"]
+                    })
+                    break
+
+                chunk = without_missing_handle(chunk, data)
+                if chunk is None:
+                    print(f"CF user.info batch error: {data.get('comment')}")
+                    return None
+
+        return infos
+
+    @staticmethod
+    async def get_user_profile(username: str, info: dict = None, previous: dict = None):
+        """
+        `info` is this handle's entry from get_user_infos, if already fetched in bulk.
+        `previous` is the last stored Codeforces stats; rating history and solved count
+        are only refetched when user.info shows they could have changed.
+        """
+        try:
+            # 1. Get User Info
+            if info is None:
+                response = await http_clients.request("codeforces", "GET",
                     CODEFORCES_USER_URL, 
                     params={"handles": username},
-                    timeout=10.0
+                    timeout=10.0,
+                    cache_key=cache_key("codeforces", username, "user.info")
                 )
                 data = response.json()
                 
                 if data["status"] != "OK":
                     return None
                 
-                user_info = data["result"][0]
-                
-                # 2. Get Contest Count (via Rating History)
+                info = data["result"][0]
+            user_info = info
+
+            if previous and previous.get("username", "").lower() != username.lower():
+                previous = None
+            last_online = user_info.get("lastOnlineTimeSeconds", 0)
+
+            # 2. Get Contest Count (via Rating History)
+            # Nearly every rated contest moves the rating, so an unchanged rating means no new
+            # entries unless the user was around for a contest since the last fetch (0 delta).
+            # The stored history (see services/history.py) is then left as it is.
+            history = None
+            rating_checked = (previous or {}).get("rating_checked", 0)
+            if (previous and "contests" in previous and previous.get("rating") == user_info.get("rating", 0)
+                    and not await missed_contest(previous, last_online)):
+                contest_count = previous["contests"]
+            else:
                 rating_url = f"https://codeforces.com/api/user.rating?handle={username}"
-                rating_res = await client.get(rating_url, timeout=10.0)
+                rating_res = await http_clients.request("codeforces", "GET", rating_url, timeout=10.0,
+                    cache_key=cache_key("codeforces", username, "user.rating"))
                 contest_count = 0
                 history = []
                 if rating_res.status_code == 200:
@@ -31,80 +163,184 @@ class CodeforcesService:
                     if r_data["status"] == "OK":
                         history = r_data["result"]
                         contest_count = len(history)
-                        
-                # 3. Get Solved Count (via Status API)
-                solved_count = 0
-                try:
-                    # Fetch only OK submissions, we might need pagination if user has > 10000 submissions but defaults usually cover enough for students
-                    status_url = f"https://codeforces.com/api/user.status?handle={username}&from=1&count=10000"
-                    status_res = await client.get(status_url, timeout=30.0)
+                        rating_checked = int(time.time()) - CODEFORCES_RATING_SETTLE
                     
-                    if status_res.status_code == 200:
-                        s_data = status_res.json()
-                        if s_data["status"] == "OK":
-                            submissions = s_data["result"]
-                            solved_problems = set()
-                            for sub in submissions:
-                                if sub.get("verdict") == "OK":
-                                    # Create a unique key for the problem (contestId + index)
-                                    problem = sub.get("problem", {})
-                                    if "contestId" in problem and "index" in problem:
-                                        key = f"{problem['contestId']}-{problem['index']}"
-                                        solved_problems.add(key)
-                                    # Fallback for old problems or problems without contest ID (rare)
-                                    elif "name" in problem:
-                                        solved_problems.add(problem["name"])
-                                        
-                            solved_count = len(solved_problems)
-                except Exception as api_err:
-                    print(f"CF API Status Error for {username}: {api_err}")
-
-                return {
-                    "platform": "Codeforces",
-                    "username": username,
-                    "rating": user_info.get("rating", 0),
-                    "rank": user_info.get("rank", "Unrated"),
-                    "max_rank": user_info.get("maxRank", "Unrated"),
-                    "max_rating": user_info.get("maxRating", 0),
-                    "contests": contest_count,
-                    "history": history,
-                    "solved": solved_count
-                }
-            except Exception as e:
-                print(f"Error fetching Codeforces for {username}: {e}")
-                return None
+            # 3. Get Solved Count (via Status API)
+            # Submitting requires being online, so an unchanged last-online time means nothing new
+            if previous and "solved" in previous and previous.get("last_online") == last_online:
+                solved_count = previous["solved"]
+            else:
+                solved_count = await CodeforcesService.get_solved_count(username)
+
+            profile = {
+                "platform": "Codeforces",
+                "username": username,
+                "rating": user_info.get("rating", 0),
+                "rank": user_info.get("rank", "Unrated"),
+                "max_rank": user_info.get("maxRank", "Unrated"),
+                "max_rating": user_info.get("maxRating", 0),
+                "contests": contest_count,
+                "solved": solved_count,
+                "last_online": last_online,
+                "rating_checked": rating_checked
+            }
+            if history is not None:
+                profile["history"] = history
+            return profile
+        except Exception as e:
+            print(f"Error fetching Codeforces for {username}: {e}")
+            return None
+
+    @staticmethod
+    async def get_solved_count(username: str):
+        """
+        Counts distinct solved problems from user.status, syncing incrementally.
+
+        Each handle keeps a high-water mark (newest fully judged submission id) and its
+        solved-problem set in `cf_submission_sync`. Only submissions newer than the mark
+        are paged in, newest first, so an idle handle costs one small request.
+        """
+        collection = db.get_async_db()["cf_submission_sync"]
+        key = username.strip().lower()
+        sync = await collection.find_one({"_id": key}, {"last_submission_id": 1, "solved_count": 1})
+        high_water = sync["last_submission_id"] if sync else 0
+        stored_count = sync.get("solved_count", 0) if sync else 0
+
+        solved_problems = set()
+        newest = high_water
+        oldest_pending = None
+        page_size = CODEFORCES_STATUS_PAGE if sync else CODEFORCES_STATUS_FIRST_PAGE
+        start = 1
+
+        try:
+            while True:
+                status_res = await http_clients.request("codeforces", "GET",
+                    "https://codeforces.com/api/user.status",
+                    params={"handle": username, "from": start, "count": page_size},
+                    timeout=30.0
+                )
+                if status_res.status_code != 200:
+                    return stored_count
+                # First syncs decode and scan up to 10k submissions; do that on a worker thread
+                s_data = await executors.run_in_thread(status_res.json)
+                if s_data["status"] != "OK":
+                    return stored_count
+
+                submissions = s_data["result"]
+                page_solved, page_newest, page_pending, reached_mark = await executors.run_in_thread(
+                    scan_submissions, submissions, high_water
+                )
+                solved_problems |= page_solved
+                newest = max(newest, page_newest)
+                if page_pending is not None:
+                    oldest_pending = page_pending if oldest_pending is None else min(oldest_pending, page_pending)
+
+                if reached_mark or len(submissions) < page_size:
+                    break
+                start += page_size
+        except Exception as api_err:
+            print(f"CF API Status Error for {username}: {api_err}")
+            return stored_count
+
+        # Don't move the mark past a submission that is still being judged
+        if oldest_pending is not None:
+            newest = min(newest, oldest_pending - 1)
+
+        if sync and newest == high_water and not solved_problems:
+            return stored_count
+
+        updated = await collection.find_one_and_update(
+            {"_id": key},
+            [
+                {"$set": {
+                    "handle": username,
+                    "solved": {"$setUnion": [{"$ifNull": ["$solved", []]}, list(solved_problems)]},
+                    "last_submission_id": {"$max": [{"$ifNull": ["$last_submission_id", 0]}, newest]},
+                    "updated_at": datetime.utcnow()
+                }},
+                {"$set": {"solved_count": {"$size": "$solved"}}}
+            ],
+            projection={"solved_count": 1},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        return updated["solved_count"]
 
     @staticmethod
     async def get_contest_standings(contest_id: str, handles: list):
-        if not handles:
+        """
+        Fetches contest.standings for many handles in concurrent chunks and merges them.
+        Standings of finished contests are final, so they are cached per
+        (contest, handle set) for CODEFORCES_FINAL_STANDINGS_TTL.
+        Returns (rows, problems), or (None, None) if nothing could be fetched.
+        """
+        unique = sorted({h.strip().lower(): h.strip() for h in handles if h and h.strip()}.values(), key=str.lower)
+        if not unique:
+            return None, None
+
+        handle_set = hashlib.sha1(";".join(h.lower() for h in unique).encode()).hexdigest()[:16]
+        key = cache_key("codeforces", f"{contest_id}:{handle_set}", "contest.standings")
+        entry = await response_cache.get(key)
+        if entry is not None and entry["expires_at"] > time.time():
+            response_cache.counters["hits"] += 1
+            cached = json.loads(entry["text"])
+            return cached["rows"], cached["problems"]
+        response_cache.counters["misses"] += 1
+
+        # The Codeforces token bucket still paces the calls; this only bounds how many are in flight
+        semaphore = asyncio.Semaphore(CODEFORCES_STANDINGS_CONCURRENCY)
+
+        async def fetch_chunk(chunk):
+            async with semaphore:
+                return await CodeforcesService._fetch_standings_chunk(contest_id, chunk)
+
+        chunks = [unique[i:i + CODEFORCES_STANDINGS_CHUNK] for i in range(0, len(unique), CODEFORCES_STANDINGS_CHUNK)]
+        results = [r for r in await asyncio.gather(*(fetch_chunk(c) for c in chunks)) if r is not None]
+        if not results:
             return None, None
-            
-        # Codeforces allows a large number of handles, but let's be safe and chunk if needed
-        # For now, just one call as URL length is the main limit. 
-        # A safer limit might be 100 handles per call if we were strictly robust, 
-        # but typical class size is small enough for one GET usually.
-        # Let's try one call first.
-        
-        handle_str = ";".join(handles)
+
+        # A team can show up in more than one chunk; keep each party once
+        rows, seen = [], set()
+        for result in results:
+            for row in result["rows"]:
+                party = row["party"]
+                ident = (party.get("participantType"), party.get("teamId"), party.get("startTimeSeconds"),
+                         tuple(sorted(m["handle"].lower() for m in party["members"])))
+                if ident not in seen:
+                    seen.add(ident)
+                    rows.append(row)
+        # Ranked rows in contest order, then unranked (rank 0, e.g. practice) ones
+        rows.sort(key=lambda r: (r.get("rank", 0) == 0, r.get("rank", 0)))
+        problems = results[0]["problems"]
+
+        finished = all(r.get("contest", {}).get("phase") == "FINISHED" for r in results)
+        if finished and len(results) == len(chunks):
+            await response_cache.store_json(key, "codeforces", {"rows": rows, "problems": problems},
+                ttl=CODEFORCES_FINAL_STANDINGS_TTL)
+        return rows, problems
+
+    @staticmethod
+    async def _fetch_standings_chunk(contest_id: str, chunk: list):
         url = "https://codeforces.com/api/contest.standings"
-        params = {
-            "contestId": contest_id,
-            "handles": handle_str,
-            "showUnofficial": "true" # Include practice/virtual if needed? matching usually checks official
-        }
-        
-        async with httpx.AsyncClient() as client:
+        while chunk:
+            params = {
+                "contestId": contest_id,
+                "handles": ";".join(chunk),
+                "showUnofficial": "true" # Include practice/virtual if needed? matching usually checks official
+            }
             try:
-                # We might need POST if handles string is too long
-                response = await client.post(url, data=params, timeout=20.0)
+                # POST keeps long handle lists out of the URL
+                response = await http_clients.request("codeforces", "POST", url, data=params, timeout=20.0)
                 data = response.json()
-                
-                if data["status"] == "OK":
-                    result = data["result"]
-                    return result["rows"], result["problems"]
-                else:
-                    print(f"CF Standings Error: {data.get('comment')}")
-                    return None, None
             except Exception as e:
                 print(f"Error fetching CF standings: {e}")
-                return None, None
+                return None
+
+            if data["status"] == "OK":
+                return data["result"]
+
+            chunk = without_missing_handle(chunk, data)
+            if chunk is None:
+                print(f"CF Standings Error: {data.get('comment')}")
+                return None
+        return None
@@ -1,6 +1,5 @@
-import httpx
-from bs4 import BeautifulSoup
-import re
+from ..http_client import http_clients
+from ..cache import response_cache, cache_key
 
 class HackerRankService:
     @staticmethod
@@ -10,48 +9,44 @@ class HackerRankService:
             "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
         }
         
-        async with httpx.AsyncClient() as client:
-            try:
-                # HackerRank often loads data dynamically or protects against scraping.
-                # A simple request might fail or return a partial page. 
-                # For this "Production" mock, we try best effort or return basic data.
-                response = await client.get(url, headers=headers, follow_redirects=True, timeout=15.0)
-                
-                if response.status_code != 200:
-                    return None
-                
-                soup = BeautifulSoup(response.content, "html.parser")
-                
-                # Try to find badges or points (Structure changes often)
-                # This is a brittle implementation, common in scrapers
-                
-                # Look for "Badges" titles or simple text
-                # HackerRank is React-heavy, might need Selenium if this fails, 
-                # but we stick to lightweight for this scope.
-                
-                # Mocking extraction logic based on common meta tags or script data
-                # Actually, let's try to find the "Badges" section count or "Points"
-                
-                # Alternative: Use an unofficial API or hidden API endpoint if known.
-                # https://www.hackerrank.com/rest/hackers/{username}/badges
-                
-                api_url = f"https://www.hackerrank.com/rest/hackers/{username}/badges"
-                api_res = await client.get(api_url, headers=headers)
-                
-                badges_count = 0
-                if api_res.status_code == 200:
-                    badges = api_res.json().get("models", [])
-                    badges_count = len(badges)
+        # Only the resulting numbers are cached; the profile page is just an existence check
+        key = cache_key("hackerrank", username, "parsed")
+        try:
+            cached = await response_cache.get_json(key)
+            if cached is not None:
+                return cached
 
-                # Get submission history or points if possible
-                # https://www.hackerrank.com/rest/hackers/{username}/scores_histogram
-                
-                return {
-                    "platform": "HackerRank",
-                    "username": username,
-                    "badges": badges_count,
-                    "solved": badges_count * 5 # Approximation if we can't get exact solved
-                }
-            except Exception as e:
-                print(f"Error fetching HackerRank for {username}: {e}")
+            # HackerRank often loads data dynamically or protects against scraping.
+            # A simple request might fail or return a partial page. 
+            # For this "Production" mock, we try best effort or return basic data.
+            response = await http_clients.request("hackerrank", "GET", url, headers=headers, follow_redirects=True, timeout=15.0)
+            
+            if response.status_code != 200:
                 return None
+            
+            # The profile page is only fetched to confirm the user exists; the numbers come from the REST API
+            # https://www.hackerrank.com/rest/hackers/{username}/badges
+            
+            api_url = f"https://www.hackerrank.com/rest/hackers/{username}/badges"
+            api_res = await http_clients.request("hackerrank", "GET", api_url, headers=headers)
+            
+            badges_count = 0
+            if api_res.status_code == 200:
+                badges = api_res.json().get("models", [])
+                badges_count = len(badges)
+
+            # Get submission history or points if possible
+            # https://www.hackerrank.com/rest/hackers/{username}/scores_histogram
+            
+            profile = {
+                "platform": "HackerRank",
+                "username": username,
+                "badges": badges_count,
+                "solved": badges_count * 5 # Approximation if we can't get exact solved
+            }
+            if api_res.status_code == 200:
+                await response_cache.store_json(key, "hackerrank", profile)
+            return profile
+        except Exception as e:
+            print(f"Error fetching HackerRank for {username}: {e}")
+            return None
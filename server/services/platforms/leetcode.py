@@ -1,14 +1,11 @@
-import httpx
+from ..http_client import http_clients
+from ..cache import response_cache, cache_key
 import asyncio
 
 LEETCODE_URL = "https://leetcode.com/graphql"
 
-class LeetCodeService:
-    @staticmethod
-    async def get_user_profile(username: str):
-        query = """
-        query getUserProfile($username: String!) {
-          matchedUser(username: $username) {
+# Selections shared by the single-user and batched profile queries
+MATCHED_USER_FIELDS = """
             username
             submitStats: submitStatsGlobal {
               acSubmissionNum {
@@ -21,14 +18,16 @@ class LeetCodeService:
               ranking
               reputation
             }
-          }
-          userContestRanking(username: $username) {
+"""
+
+CONTEST_RANKING_FIELDS = """
             attendedContestsCount
             rating
             globalRanking
             topPercentage
-          }
-          userContestRankingHistory(username: $username) {
+"""
+
+CONTEST_HISTORY_FIELDS = """
             rating
             attended
             problemsSolved
@@ -37,94 +36,142 @@ class LeetCodeService:
               title
               startTime
             }
-          }
+"""
+
+# Users packed into one aliased GraphQL document. Each user adds three root fields,
+# so this keeps documents well inside LeetCode's query size and complexity limits.
+LEETCODE_BATCH_SIZE = 10
+
+class LeetCodeService:
+    @staticmethod
+    def parse_profile(username: str, user_data: dict, contest_data: dict, history: list):
+        contest_data = contest_data or {}
+
+        # Parse Solved Counts
+        stats = user_data["submitStats"]["acSubmissionNum"]
+        total = next((x["count"] for x in stats if x["difficulty"] == "All"), 0)
+        easy = next((x["count"] for x in stats if x["difficulty"] == "Easy"), 0)
+        medium = next((x["count"] for x in stats if x["difficulty"] == "Medium"), 0)
+        hard = next((x["count"] for x in stats if x["difficulty"] == "Hard"), 0)
+        
+        # Contest History for Max Rating
+        attended_count = contest_data.get("attendedContestsCount", 0)
+        max_rating = 0
+        
+        history = history or []
+        if history:
+            # Filter attended
+            attended_history = [h for h in history if h["attended"]]
+            if attended_history:
+                max_rating = max(h["rating"] for h in attended_history)
+
+        return {
+            "platform": "LeetCode",
+            "username": username,
+            "total_solved": total,
+            "easy": easy,
+            "medium": medium,
+            "hard": hard,
+            "rating": int(contest_data.get("rating", 0)) if contest_data.get("rating") else 0,
+            "global_rank": contest_data.get("globalRanking", 0),
+            "top_percentage": contest_data.get("topPercentage", 0),
+            "ranking": user_data["profile"]["ranking"],
+            "attended": attended_count,
+            "max_rating": int(max_rating),
+            "history": [h for h in history if h.get("attended")] # Store attended history
         }
+
+    @staticmethod
+    async def get_user_profile(username: str):
+        query = f"""
+        query getUserProfile($username: String!) {{
+          matchedUser(username: $username) {{{MATCHED_USER_FIELDS}          }}
+          userContestRanking(username: $username) {{{CONTEST_RANKING_FIELDS}          }}
+          userContestRankingHistory(username: $username) {{{CONTEST_HISTORY_FIELDS}          }}
+        }}
         """
         
         variables = {"username": username}
         
-        async with httpx.AsyncClient() as client:
-            try:
-                response = await client.post(
-                    LEETCODE_URL, 
-                    json={"query": query, "variables": variables},
-                    timeout=10.0
-                )
-                data = response.json()
-                
-                if "errors" in data or not data.get("data", {}).get("matchedUser"):
-                    return None
-                
-                user_data = data["data"]["matchedUser"]
-                contest_data = data["data"].get("userContestRanking") or {}
-                
-                # Parse Solved Counts
-                stats = user_data["submitStats"]["acSubmissionNum"]
-                total = next((x["count"] for x in stats if x["difficulty"] == "All"), 0)
-                easy = next((x["count"] for x in stats if x["difficulty"] == "Easy"), 0)
-                medium = next((x["count"] for x in stats if x["difficulty"] == "Medium"), 0)
-                hard = next((x["count"] for x in stats if x["difficulty"] == "Hard"), 0)
-                
-                # Contest History for Max Rating
-                attended_count = contest_data.get("attendedContestsCount", 0)
-                max_rating = 0
-                
-                history = data["data"].get("userContestRankingHistory") or []
-                if history:
-                    # Filter attended
-                    attended_history = [h for h in history if h["attended"]]
-                    if attended_history:
-                        max_rating = max(h["rating"] for h in attended_history)
-
-                return {
-                    "platform": "LeetCode",
-                    "username": username,
-                    "total_solved": total,
-                    "easy": easy,
-                    "medium": medium,
-                    "hard": hard,
-                    "rating": int(contest_data.get("rating", 0)) if contest_data.get("rating") else 0,
-                    "global_rank": contest_data.get("globalRanking", 0),
-                    "top_percentage": contest_data.get("topPercentage", 0),
-                    "ranking": user_data["profile"]["ranking"],
-                    "attended": attended_count,
-                    "max_rating": int(max_rating),
-                    "history": [h for h in history if h.get("attended")] # Store attended history
-                }
-            except Exception as e:
-                print(f"Error fetching LeetCode for {username}: {e}")
+        try:
+            response = await http_clients.request("leetcode", "POST",
+                LEETCODE_URL, 
+                json={"query": query, "variables": variables},
+                timeout=10.0,
+                cache_key=cache_key("leetcode", username, "profile")
+            )
+            data = response.json()
+            
+            if "errors" in data or not data.get("data", {}).get("matchedUser"):
                 return None
+            
+            return LeetCodeService.parse_profile(
+                username,
+                data["data"]["matchedUser"],
+                data["data"].get("userContestRanking"),
+                data["data"].get("userContestRankingHistory")
+            )
+        except Exception as e:
+            print(f"Error fetching LeetCode for {username}: {e}")
+            return None
 
     @staticmethod
-    async def get_contest_history(username: str):
-        query = """
-        query getContestRankingData($username: String!) {
-          userContestRankingHistory(username: $username) {
-            attended
-            rating
-            ranking
-            problemsSolved
-            contest {
-              title
-              startTime
-            }
-          }
-        }
+    async def get_user_profiles(usernames: list):
         """
-        variables = {"username": username}
-        
-        async with httpx.AsyncClient() as client:
-            try:
-                response = await client.post(
-                    LEETCODE_URL, 
-                    json={"query": query, "variables": variables},
-                    timeout=10.0
-                )
-                data = response.json()
-                history = data.get("data", {}).get("userContestRankingHistory", [])
-                
-                # Filter only attended contests
-                return [h for h in history if h["attended"]]
-            except Exception as e:
-                print(f"Error fetching LC History for {username}: {e}")
-                return []
+        Fetches many profiles with aliased GraphQL documents (`u0: matchedUser(...)`,
+        `u1: ...`), LEETCODE_BATCH_SIZE users per request.
+
+        Returns a dict keyed by lowercase username. Users that don't exist map to None;
+        users whose batch request failed are left out so callers can retry them alone.
+        """
+        unique = list(dict.fromkeys(u.strip() for u in usernames if u and u.strip()))
+        batches = [unique[i:i + LEETCODE_BATCH_SIZE] for i in range(0, len(unique), LEETCODE_BATCH_SIZE)]
+        results = await asyncio.gather(*(LeetCodeService._fetch_batch(b) for b in batches))
+
+        profiles = {}
+        for batch_profiles in results:
+            profiles.update(batch_profiles)
+        return profiles
+
+    @staticmethod
+    async def _fetch_batch(usernames: list):
+        var_defs = ", ".join(f"$u{i}: String!" for i in range(len(usernames)))
+        fields = "".join(
+            f"""
+          u{i}: matchedUser(username: $u{i}) {{{MATCHED_USER_FIELDS}          }}
+          r{i}: userContestRanking(username: $u{i}) {{{CONTEST_RANKING_FIELDS}          }}
+          h{i}: userContestRankingHistory(username: $u{i}) {{{CONTEST_HISTORY_FIELDS}          }}"""
+            for i in range(len(usernames))
+        )
+        query = f"query getUserProfiles({var_defs}) {{{fields}\n        }}"
+        variables = {f"u{i}": name for i, name in enumerate(usernames)}
+
+        try:
+            response = await http_clients.request("leetcode", "POST",
+                LEETCODE_URL,
+                json={"query": query, "variables": variables},
+                timeout=20.0
+            )
+            data = response.json().get("data")
+            if not data:
+                return {}
+
+            # Unknown users come back as null aliases (plus an entry in "errors")
+            profiles, seeds = {}, {}
+            for i, name in enumerate(usernames):
+                user_data = data.get(f"u{i}")
+                if user_data:
+                    # Seed the single-user cache entry in the shape get_user_profile expects
+                    seeds[cache_key("leetcode", name, "profile")] = {"data": {
+                        "matchedUser": user_data,
+                        "userContestRanking": data.get(f"r{i}"),
+                        "userContestRankingHistory": data.get(f"h{i}"),
+                    }}
+                profiles[name.lower()] = LeetCodeService.parse_profile(
+                    name, user_data, data.get(f"r{i}"), data.get(f"h{i}")
+                ) if user_data else None
+            await response_cache.store_json_many("leetcode", seeds)
+            return profiles
+        except Exception as e:
+            print(f"Error fetching LeetCode batch of {len(usernames)}: {e}")
+            return {}
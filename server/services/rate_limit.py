@@ -0,0 +1,74 @@
+import asyncio
+import os
+import random
+import threading
+import time
+
+# (requests per second, burst size) per platform.
+# Codeforces asks API users to stay around one call every two seconds.
+PLATFORM_RATES = {
+    "codeforces": (0.5, 1),
+    "leetcode": (2.0, 4),
+    "codechef": (1.0, 2),
+    "hackerrank": (1.0, 2),
+    "atcoder": (1.0, 2),
+}
+
+# Buckets live in process memory, so every process that calls the platforms (each
+# uvicorn process, each `python worker.py`) paces itself separately. Set this to
+# the number of such processes; each one then takes 1/N of every platform's rate,
+# keeping the combined traffic within PLATFORM_RATES.
+RATE_LIMIT_PROCESSES = max(1, int(os.getenv("RATE_LIMIT_PROCESSES", "1")))
+
+RETRY_STATUSES = {429, 503}
+MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", "3"))
+BACKOFF_BASE = float(os.getenv("HTTP_BACKOFF_BASE", "2.0"))
+BACKOFF_MAX = float(os.getenv("HTTP_BACKOFF_MAX", "60.0"))
+
+
+class TokenBucket:
+    """
+    Token bucket that hands out send slots for one platform.
+
+    Slots are reserved under a thread lock and waited for with asyncio.sleep, so the
+    same bucket paces both the API event loop and the scheduler thread's loop.
+    """
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            # Going negative queues the caller behind earlier reservations
+            self.tokens -= 1
+            if self.tokens >= 0:
+                return 0.0
+            return -self.tokens / self.rate
+
+    async def acquire(self):
+        wait = self.reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+buckets = {
+    platform: TokenBucket(rate / RATE_LIMIT_PROCESSES, max(1, burst // RATE_LIMIT_PROCESSES))
+    for platform, (rate, burst) in PLATFORM_RATES.items()
+}
+
+
+def retry_delay(response, attempt: int) -> float:
+    retry_after = response.headers.get("Retry-After")
+    if retry_after and retry_after.isdigit():
+        delay = float(retry_after)
+    else:
+        delay = BACKOFF_BASE * (2 ** attempt)
+    # Full jitter so throttled callers don't retry in lockstep
+    return min(BACKOFF_MAX, delay) * random.uniform(0.5, 1.5)
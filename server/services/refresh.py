@@ -0,0 +1,122 @@
+import asyncio
+import os
+from datetime import datetime
+from database import db
+from pymongo import UpdateOne
+from services.aggregator import PlatformAggregator
+from services.planner import RefreshPlan, REFRESH_PLATFORMS, ACTIVE, UNCHANGED, FAILED, NOT_FOUND, is_active
+from services.student_store import StudentStore
+from services.summary import DashboardSummary
+
+# Global cap on students refreshed at once. Per-platform pacing is done by the
+# token buckets in the HTTP layer, so this only bounds in-flight work.
+REFRESH_CONCURRENCY = int(os.getenv("REFRESH_CONCURRENCY", "8"))
+
+async def update_single_student(student, prefetched: dict = None, platforms: list = None, contest_ends: dict = None):
+    """
+    Refreshes `platforms` of one student (every handle by default), writing only
+    the platforms whose stats changed, and records the outcome in the refresh plan.
+    """
+    try:
+        print(f"Updating {student['reg_no']}...")
+        current_handles = student.get("handles", {})
+        refreshed = [p for p in (platforms or REFRESH_PLATFORMS) if current_handles.get(p)]
+
+        # 1. Update Aggregate Stats
+        new_stats = await PlatformAggregator.verify_profile(
+            current_handles, previous=student.get("stats"), prefetched=prefetched, only=refreshed
+        )
+        changed = set()
+        if new_stats:
+            changed = await StudentStore.update_platforms(student, new_stats, {"last_updated": datetime.utcnow()})
+
+        # Activity, not any stats change, drives the plan: ranks move without the student doing anything
+        previous = student.get("stats") or {}
+        missing = PlatformAggregator.not_found(current_handles, prefetched)
+        outcomes = {}
+        for p in refreshed:
+            if p in new_stats:
+                outcomes[p] = ACTIVE if is_active(p, previous.get(p), new_stats[p]) else UNCHANGED
+            else:
+                outcomes[p] = NOT_FOUND if p in missing else FAILED
+        await RefreshPlan.record(student["reg_no"], outcomes, contest_ends or {})
+
+        # 2. Sync LeetCode Contest History (Historical Aggregation)
+        # The profile response already carries the attended history, so reuse it.
+        # Unchanged profiles have nothing new to add.
+        if "leetcode" in changed and new_stats.get("leetcode"):
+            history = new_stats["leetcode"].get("history", [])
+            
+            # One batched upsert per student, relying on the unique
+            # (reg_no, platform, contest_name) index instead of a find_one per contest
+            operations = [
+                UpdateOne(
+                    {
+                        "reg_no": student["reg_no"],
+                        "platform": "LeetCode",
+                        "contest_name": contest["contest"]["title"]
+                    },
+                    {"$setOnInsert": {
+                        "date": datetime.fromtimestamp(contest["contest"]["startTime"]).strftime('%Y-%m-%d'),
+                        "rating": contest["rating"],
+                        "rank": contest["ranking"],
+                        "total_solved": contest["problemsSolved"], # LC gives total solved in contest
+                        "easy": 0, "medium": 0, "hard": 0, # API doesn't give difficulty split easily here
+                        "total": 4 # Standard LC contest size
+                    }},
+                    upsert=True
+                )
+                for contest in history
+            ]
+            if operations:
+                await db.get_async_db()["contest_performance"].bulk_write(operations, ordered=False)
+
+        return bool(new_stats)
+    except Exception as e:
+        print(f"Failed to update {student['reg_no']}: {e}")
+        return False
+
+class RefreshEngine:
+    """
+    Single entry point for refreshing students, shared by the scheduled sync and
+    the department refresh endpoint.
+    """
+
+    @staticmethod
+    async def refresh_students(students, concurrency: int = REFRESH_CONCURRENCY, rebuild_summary: bool = True,
+                               platforms: dict = None):
+        """
+        Refreshes the given students with at most `concurrency` in flight.
+        `platforms` maps reg_no -> platforms to refresh; students not in it (or
+        no map at all) get every handle refreshed.
+        Returns the number of students whose stats were updated. Job workers pass
+        rebuild_summary=False and rebuild once the whole run is done.
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+        platforms = platforms or {}
+        prefetched = await PlatformAggregator.prefetch(
+            students, {s["reg_no"]: platforms.get(s["reg_no"]) or REFRESH_PLATFORMS for s in students}
+        )
+        try:
+            contest_ends = await RefreshPlan.contest_ends(datetime.utcnow())
+        except Exception as e:
+            print(f"Could not load contest end times for planning: {e}")
+            contest_ends = {}
+
+        async def guarded(student):
+            async with semaphore:
+                return await update_single_student(
+                    student, prefetched, platforms.get(student["reg_no"]), contest_ends
+                )
+
+        results = await asyncio.gather(*(guarded(s) for s in students))
+        if not rebuild_summary:
+            return sum(1 for updated in results if updated)
+
+        # Recompute the dashboard summary once so concurrent $inc deltas can't drift
+        try:
+            await DashboardSummary.rebuild()
+        except Exception as e:
+            print(f"Failed to rebuild dashboard summary: {e}")
+
+        return sum(1 for updated in results if updated)
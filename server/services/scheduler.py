@@ -1,85 +1,59 @@
 from apscheduler.schedulers.background import BackgroundScheduler
-from apscheduler.triggers.cron import CronTrigger
 import asyncio
+import os
+import uuid
 from datetime import datetime
 from database import db
-from services.aggregator import PlatformAggregator
+from services.http_client import http_clients
+from services.jobs import JobQueue, LeaderLock, worker_name
+from services.planner import RefreshPlan
+
+# How often the planner queues the (student, platform) pairs that have come due
+PLAN_TICK_MINUTES = int(os.getenv("PLAN_TICK_MINUTES", "10"))
+# The planning instance keeps the lock across ticks by renewing it; if it goes
+# away another instance takes over once this runs out.
+CRON_LOCK_SECONDS = int(os.getenv("CRON_LOCK_SECONDS", str(PLAN_TICK_MINUTES * 90)))
 
 scheduler = BackgroundScheduler()
+# Identifies this process as the owner of the cron lock
+SCHEDULER_ID = worker_name()
 
 def test_job():
     print(f"[{datetime.now()}] Background Job: Service is alive.")
 
-async def update_single_student(student):
-    try:
-        print(f"Updating {student['reg_no']}...")
-        current_handles = student.get("handles", {})
-        
-        # 1. Update Aggregate Stats
-        new_stats = await PlatformAggregator.verify_profile(current_handles)
-        if new_stats:
-            db.get_db()["students"].update_one(
-                {"_id": student["_id"]},
-                {"$set": {"stats": new_stats, "last_updated": datetime.utcnow()}}
-            )
-
-        # 2. Sync LeetCode Contest History (Historical Aggregation)
-        if "leetcode" in current_handles and current_handles["leetcode"]:
-            from services.platforms.leetcode import LeetCodeService
-            history = await LeetCodeService.get_contest_history(current_handles["leetcode"])
-            
-            # Bulk Insert/Upsert logic for ContestPerformance
-            # This is simplified; normally we'd check duplicates efficiently
-            for contest in history:
-                contest_name = contest["contest"]["title"]
-                
-                # Check if exists
-                exists = db.get_db()["contest_performance"].find_one({
-                    "reg_no": student["reg_no"],
-                    "platform": "LeetCode",
-                    "contest_name": contest_name
-                })
-                
-                if not exists:
-                    db.get_db()["contest_performance"].insert_one({
-                        "reg_no": student["reg_no"],
-                        "platform": "LeetCode",
-                        "contest_name": contest_name,
-                        "date": datetime.fromtimestamp(contest["contest"]["startTime"]).strftime('%Y-%m-%d'),
-                        "rating": contest["rating"],
-                        "rank": contest["ranking"],
-                        "total_solved": contest["problemsSolved"], # LC gives total solved in contest
-                        "easy": 0, "medium": 0, "hard": 0, # API doesn't give difficulty split easily here
-                        "total": 4 # Standard LC contest size
-                    })
-                    
-    except Exception as e:
-        print(f"Failed to update {student['reg_no']}: {e}")
-
-def update_student_stats():
+def plan_refreshes():
     """
-    Scheduled job to update all student stats.
-    Since Apscheduler runs in a separate thread, we need a new event loop for async calls if not careful.
-    However, using asyncio.run() is the safest way to execute the async aggregator from a synchronous job.
+    Scheduled job that queues the refreshes that are due according to the refresh
+    plan (services/planner.py). Every API instance runs it; the leader lock lets
+    only one of them plan, and the workers (services/jobs.py) do the refreshing.
+    Apscheduler runs this in its own thread, so it gets its own event loop via asyncio.run().
     """
-    print(f"[{datetime.now()}] Starting scheduled update for all students...")
     try:
-        # Check if DB is connected (it should be)
-        students = list(db.get_db()["students"].find())
-        
         async def runner():
-            tasks = [update_single_student(s) for s in students]
-            if tasks:
-                await asyncio.gather(*tasks)
-        
+            try:
+                if not await LeaderLock.acquire("refresh-cron", SCHEDULER_ID, CRON_LOCK_SECONDS):
+                    return
+                now = datetime.utcnow()
+                await RefreshPlan.seed(now)
+                # Pairs still waiting on a job aren't queued again until its run is over
+                await RefreshPlan.release(await JobQueue.pending_runs(), now)
+                run_id = uuid.uuid4().hex
+                targets = await RefreshPlan.take_due(run_id, now)
+                if targets:
+                    await JobQueue.enqueue(targets, run_id)
+                    pairs = sum(len(platforms) for _, platforms in targets)
+                    print(f"[{datetime.now()}] Queued refresh run {run_id}: {pairs} due handles of {len(targets)} students")
+            finally:
+                # This job runs on its own event loop, so it owns its HTTP and Mongo clients too
+                await http_clients.close()
+                await db.close_async()
+
         asyncio.run(runner())
-        print(f"[{datetime.now()}] Completed update for {len(students)} students.")
     except Exception as e:
-        print(f"Error in scheduled update: {e}")
+        print(f"Error in scheduled refresh planning: {e}")
 
 def start_scheduler():
-    # Run every 6 hours
-    scheduler.add_job(update_student_stats, CronTrigger(hour='*/6'))
+    scheduler.add_job(plan_refreshes, 'interval', minutes=PLAN_TICK_MINUTES, next_run_time=datetime.now())
     
     # Keep the heartbeat
     scheduler.add_job(test_job, 'interval', minutes=30)
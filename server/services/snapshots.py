@@ -0,0 +1,177 @@
+import os
+import tempfile
+from datetime import datetime, timezone
+from pymongo import InsertOne
+from database import db
+from services.export import XlsxStreamWriter
+from services.executors import executors
+
+SNAPSHOT_BASE_COLUMNS = ["Reg No", "Name", "Date"]
+# Columns of each sheet of the performance report, in workbook order
+SNAPSHOT_SHEETS = {
+    "LeetCode": ["Current Rating", "Max Rating", "Total Contest Attended"],
+    "Codeforces": ["Max Rating", "Total Contest Participated", "Total Problems Solved"],
+    "HackerRank": ["Total Problems Solved"],
+    "CodeChef": ["Current Rating", "Stars", "Total Problems Solved"],
+}
+
+
+def snapshot_rows(student: dict) -> dict:
+    """Returns {sheet: row} of one student's stats for the daily performance report."""
+    stats = student.get("stats", {})
+
+    # LeetCode
+    lc = stats.get("leetcode", {})
+    # Max Rating is derived from the contest history when the profile is fetched
+    lc_max = lc.get("max_rating") or lc.get("rating", 0)
+
+    cf = stats.get("codeforces", {})
+    hr = stats.get("hackerrank", {})
+    cc = stats.get("codechef", {})
+    return {
+        "LeetCode": {
+            "Current Rating": lc.get("rating", "N/A"),
+            "Max Rating": int(lc_max) if lc_max else "N/A",
+            "Total Contest Attended": lc.get("attended", 0)
+        },
+        "Codeforces": {
+            "Max Rating": cf.get("max_rating", 0),
+            "Total Contest Participated": cf.get("contests", 0),
+            "Total Problems Solved": cf.get("solved", 0)
+        },
+        "HackerRank": {
+            "Total Problems Solved": hr.get("solved", 0)
+        },
+        "CodeChef": {
+            "Current Rating": cc.get("rating", 0),
+            "Stars": cc.get("stars", 0),
+            "Total Problems Solved": cc.get("solved", 0)
+        },
+    }
+
+
+class PerformanceSnapshots:
+    """
+    Daily performance report rows in `performance_snapshots`, one document per
+    (report, date, student). Taking today's snapshot only touches today's
+    documents; the workbook is rendered from the collection on download and
+    kept on disk until a newer snapshot is stored.
+    """
+
+    @staticmethod
+    def report_key(dept: str, year: str) -> str:
+        return f"{dept}_{year}"
+
+    @staticmethod
+    async def take(dept: str, year: str, students: list):
+        """Stores today's rows for the cohort, replacing any snapshot already taken today."""
+        report = PerformanceSnapshots.report_key(dept, year)
+        date_str = datetime.now().strftime("%Y-%m-%d")
+        now = datetime.utcnow()
+
+        collection = db.get_async_db()["performance_snapshots"]
+        await collection.delete_many({"report": report, "date": date_str})
+        operations = [
+            InsertOne({
+                "report": report,
+                "date": date_str,
+                "reg_no": s.get("reg_no", "Unknown"),
+                "name": s.get("name", "Unknown"),
+                "sheets": snapshot_rows(s),
+                "stored_at": now,
+            })
+            for s in students
+        ]
+        if operations:
+            await collection.bulk_write(operations, ordered=False)
+        return len(operations)
+
+    @staticmethod
+    async def latest(report: str):
+        doc = await db.get_async_db()["performance_snapshots"].find_one(
+            {"report": report}, {"stored_at": 1}, sort=[("stored_at", -1)]
+        )
+        return doc["stored_at"] if doc else None
+
+    @staticmethod
+    async def import_legacy(report: str, filepath: str):
+        """
+        Loads a workbook written by the old read-merge-rewrite update into the
+        collection. Only runs while the report has no snapshots, so it happens once.
+        """
+        if not os.path.exists(filepath):
+            return 0
+        collection = db.get_async_db()["performance_snapshots"]
+        if await collection.find_one({"report": report}, {"_id": 1}):
+            return 0
+
+        import pandas as pd
+        try:
+            sheets = await executors.run_in_thread(lambda: pd.read_excel(filepath, sheet_name=None))
+        except Exception as e:
+            print(f"Error reading legacy report {filepath}, skipping import: {e}")
+            return 0
+
+        stored_at = datetime.fromtimestamp(os.path.getmtime(filepath), timezone.utc).replace(tzinfo=None)
+        docs = {}
+        for sheet_name, df in sheets.items():
+            if sheet_name not in SNAPSHOT_SHEETS or "Reg No" not in df.columns or "Date" not in df.columns:
+                continue
+            df = df.astype(object).where(df.notna(), None)
+            for row in df.to_dict("records"):
+                key = (str(row["Date"])[:10], str(row["Reg No"]))
+                doc = docs.setdefault(key, {
+                    "report": report,
+                    "date": key[0],
+                    "reg_no": key[1],
+                    "name": row.get("Name") or "Unknown",
+                    "sheets": {},
+                    "stored_at": stored_at,
+                })
+                doc["sheets"][sheet_name] = {c: row.get(c) for c in SNAPSHOT_SHEETS[sheet_name]}
+
+        if docs:
+            await collection.bulk_write([InsertOne(d) for d in docs.values()], ordered=False)
+            print(f"Imported {len(docs)} legacy rows of {filepath} into performance_snapshots")
+        return len(docs)
+
+    @staticmethod
+    async def render(report: str, filepath: str):
+        """
+        Returns the path of the report workbook, rendering it again only when a
+        snapshot was stored after the file on disk was written. None if the report
+        has no snapshots.
+        """
+        latest = await PerformanceSnapshots.latest(report)
+        if latest is None:
+            return None
+        latest_ts = latest.replace(tzinfo=timezone.utc).timestamp()
+        if os.path.exists(filepath) and os.path.getmtime(filepath) >= latest_ts:
+            return filepath
+
+        # Write next to the target and swap it in, so a download never sees a half-written
+        # file; each render gets its own temp file, so concurrent downloads don't collide
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(filepath) or ".", suffix=".xlsx.tmp")
+        os.close(fd)
+        try:
+            writer = XlsxStreamWriter(tmp_path)
+            for sheet_name, columns in SNAPSHOT_SHEETS.items():
+                writer.add_sheet(sheet_name, SNAPSHOT_BASE_COLUMNS + columns)
+
+            cursor = db.get_async_db()["performance_snapshots"].find(
+                {"report": report},
+                # Default collation, like the (report, date, reg_no) index that serves this sort
+                sort=[("date", 1), ("reg_no", 1)]
+            )
+            async for doc in cursor:
+                base = {"Reg No": doc["reg_no"], "Name": doc["name"], "Date": doc["date"]}
+                for sheet_name, row in doc.get("sheets", {}).items():
+                    if sheet_name in SNAPSHOT_SHEETS:
+                        writer.write_row(sheet_name, {**base, **row})
+            await executors.run_in_thread(writer.close)
+            os.replace(tmp_path, filepath)
+        finally:
+            # Left behind only if the render failed
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return filepath
@@ -0,0 +1,123 @@
+import hashlib
+import json
+from datetime import datetime
+from database import db
+from services.history import RatingHistory
+from services.summary import DashboardSummary, student_total
+
+def content_hash(data) -> str:
+    """Stable hash of one platform's stats or history, compared to detect changes."""
+    return hashlib.sha1(json.dumps(data, sort_keys=True, default=str).encode()).hexdigest()
+
+def stored_hash(student: dict, platform: str):
+    stored = (student.get("stats_hash") or {}).get(platform)
+    stats = student.get("stats") or {}
+    if stored is None and platform in stats:
+        # Written before hashes were kept
+        stored = content_hash(stats[platform])
+    return stored
+
+class StudentStore:
+    """
+    Writes to `students` that derived data depends on. Every insert, update and
+    delete goes through here so the stored total, the dashboard summary and the
+    offloaded rating histories stay in step.
+
+    Each platform's stats and history are stored with a content hash
+    (stats_hash.<platform>, history_hash.<platform>). A refresh only writes the
+    platforms whose hash moved, and bumps `last_changed` when any did;
+    `last_updated` is just the time of the last refresh.
+    """
+
+    @staticmethod
+    async def create(student_dict: dict):
+        student_dict["stats"], histories = RatingHistory.split(student_dict.get("stats"))
+        student_dict["total_solved"] = student_total(student_dict["stats"])
+        student_dict["stats_hash"] = {p: content_hash(data) for p, data in student_dict["stats"].items()}
+        student_dict["history_hash"] = {p: content_hash(entries) for p, entries in histories.items()}
+        student_dict["last_changed"] = datetime.utcnow()
+        result = await db.get_async_db()["students"].insert_one(student_dict)
+        await RatingHistory.save(student_dict["reg_no"], histories)
+        await DashboardSummary.apply(None, student_dict)
+        return result.inserted_id
+
+    @staticmethod
+    async def update(student: dict, fields: dict):
+        """Applies a $set of `fields` to an already-loaded student document. A "stats" field replaces all platforms."""
+        if "stats" in fields:
+            stats, histories = RatingHistory.split(fields["stats"])
+            stats_hash = {p: content_hash(data) for p, data in stats.items()}
+            history_hash = {p: content_hash(entries) for p, entries in histories.items()}
+
+            # Histories only go when the handle itself was removed or moved to another
+            # account, not on a failed fetch
+            handles = fields.get("handles", student.get("handles")) or {}
+            old_handles = student.get("handles") or {}
+            dropped = [p for p in (student.get("stats") or {}) if not handles.get(p)]
+            switched = [p for p in handles if handles.get(p) and old_handles.get(p) and handles[p] != old_handles[p]]
+            if dropped or switched:
+                for collection in ("rating_history", "contest_results"):
+                    await db.get_async_db()[collection].delete_many(
+                        {"reg_no": student["reg_no"], "platform": {"$in": dropped + switched}}
+                    )
+
+            stored_history = {p: h for p, h in (student.get("history_hash") or {}).items() if p not in dropped + switched}
+            changed_histories = {p: histories[p] for p in histories if history_hash[p] != stored_history.get(p)}
+            await RatingHistory.save(student["reg_no"], changed_histories)
+
+            fields = {
+                **fields,
+                "stats": stats,
+                "total_solved": student_total(stats),
+                "stats_hash": stats_hash,
+                "history_hash": {**stored_history, **history_hash},
+            }
+            old_hash = {p: stored_hash(student, p) for p in (student.get("stats") or {})}
+            if stats_hash != old_hash or changed_histories:
+                fields["last_changed"] = datetime.utcnow()
+        await db.get_async_db()["students"].update_one({"_id": student["_id"]}, {"$set": fields})
+        await DashboardSummary.apply(student, {**student, **fields})
+
+    @staticmethod
+    async def update_platforms(student: dict, platform_stats: dict, fields: dict = None) -> set:
+        """
+        Writes the given platforms' stats, leaving the student's other platforms as
+        stored, and only those whose stats or history hash differs from the stored
+        one. Returns the set of platforms that changed.
+        """
+        summary, histories = RatingHistory.split(platform_stats)
+        stats_hash = {p: content_hash(data) for p, data in summary.items()}
+        history_hash = {p: content_hash(entries) for p, entries in histories.items()}
+        stats_changed = {p for p, h in stats_hash.items() if h != stored_hash(student, p)}
+        stored_history = student.get("history_hash") or {}
+        history_changed = {p for p, h in history_hash.items() if h != stored_history.get(p)}
+
+        await RatingHistory.save(student["reg_no"], {p: histories[p] for p in history_changed})
+
+        update = dict(fields or {})
+        for p in stats_changed:
+            update[f"stats.{p}"] = summary[p]
+            update[f"stats_hash.{p}"] = stats_hash[p]
+        for p in history_changed:
+            update[f"history_hash.{p}"] = history_hash[p]
+        if stats_changed or history_changed:
+            update["last_changed"] = datetime.utcnow()
+        stats = student.get("stats") or {}
+        if stats_changed:
+            stats = {**stats, **{p: summary[p] for p in stats_changed}}
+            update["total_solved"] = student_total(stats)
+
+        if update:
+            await db.get_async_db()["students"].update_one({"_id": student["_id"]}, {"$set": update})
+        if stats_changed:
+            await DashboardSummary.apply(student, {**student, "stats": stats})
+        return stats_changed | history_changed
+
+    @staticmethod
+    async def delete(reg_no: str):
+        deleted = await db.get_async_db()["students"].find_one_and_delete({"reg_no": reg_no})
+        if deleted:
+            await db.get_async_db()["rating_history"].delete_many({"reg_no": reg_no})
+            await db.get_async_db()["contest_results"].delete_many({"reg_no": reg_no})
+            await DashboardSummary.apply(deleted, None)
+        return deleted
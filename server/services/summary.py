@@ -0,0 +1,112 @@
+from database import db
+
+SUMMARY_ID = "dashboard"
+DEFAULT_DEPARTMENTS = ["CSE", "ECE", "IT", "AI"]
+
+# Solved-count fields summed into a student's total, per platform
+SOLVED_FIELDS = {
+    "leetcode": "total_solved",
+    "codechef": "solved",
+    "codeforces": "solved",
+    "hackerrank": "solved",
+}
+
+def student_total(stats: dict) -> int:
+    stats = stats or {}
+    return sum((stats.get(platform) or {}).get(field, 0) or 0 for platform, field in SOLVED_FIELDS.items())
+
+def skill_level(total: int) -> str:
+    if total > 500:
+        return "expert"
+    elif total > 200:
+        return "intermediate"
+    return "beginner"
+
+def contribution(student: dict) -> dict:
+    """Counters one student adds to the summary document."""
+    if not student:
+        return {}
+    total = student_total(student.get("stats"))
+    dept = student.get("department", "Unknown")
+    return {
+        "total_students": 1,
+        "total_solved": total,
+        f"skill.{skill_level(total)}": 1,
+        "inactive": 1 if total == 0 else 0,
+        f"departments.{dept}.count": 1,
+        f"departments.{dept}.solved": total,
+    }
+
+class DashboardSummary:
+    """
+    Materialized dashboard counters in `summaries`, so the dashboard reads one
+    document instead of every student.
+
+    Each student write applies its delta with $inc; rebuild() recomputes the whole
+    document with an aggregation pipeline after bulk refreshes to absorb any drift.
+    Deltas only apply to an existing document: a missing one is built whole by
+    get() rather than started from a partial delta.
+    """
+
+    @staticmethod
+    async def apply(old: dict, new: dict):
+        old_counts, new_counts = contribution(old), contribution(new)
+        delta = {}
+        for key in old_counts.keys() | new_counts.keys():
+            change = new_counts.get(key, 0) - old_counts.get(key, 0)
+            if change:
+                delta[key] = change
+        if not delta:
+            return
+        await db.get_async_db()["summaries"].update_one({"_id": SUMMARY_ID}, {"$inc": delta})
+
+    @staticmethod
+    async def rebuild():
+        total_expr = {"$add": [
+            {"$ifNull": [f"$stats.{platform}.{field}", 0]} for platform, field in SOLVED_FIELDS.items()
+        ]}
+        pipeline = [
+            {"$project": {"_id": 0, "department": {"$ifNull": ["$department", "Unknown"]}, "total": total_expr}},
+            {"$group": {
+                "_id": "$department",
+                "count": {"$sum": 1},
+                "solved": {"$sum": "$total"},
+                "expert": {"$sum": {"$cond": [{"$gt": ["$total", 500]}, 1, 0]}},
+                "intermediate": {"$sum": {"$cond": [{"$and": [{"$gt": ["$total", 200]}, {"$lte": ["$total", 500]}]}, 1, 0]}},
+                "inactive": {"$sum": {"$cond": [{"$eq": ["$total", 0]}, 1, 0]}},
+            }},
+        ]
+        cursor = await db.get_async_db()["students"].aggregate(pipeline)
+        groups = await cursor.to_list()
+
+        summary = {
+            "total_students": 0,
+            "total_solved": 0,
+            "skill": {"expert": 0, "intermediate": 0, "beginner": 0},
+            "inactive": 0,
+            "departments": {},
+        }
+        for g in groups:
+            summary["total_students"] += g["count"]
+            summary["total_solved"] += g["solved"]
+            summary["skill"]["expert"] += g["expert"]
+            summary["skill"]["intermediate"] += g["intermediate"]
+            summary["skill"]["beginner"] += g["count"] - g["expert"] - g["intermediate"]
+            summary["inactive"] += g["inactive"]
+            summary["departments"][g["_id"]] = {"count": g["count"], "solved": g["solved"]}
+
+        await db.get_async_db()["summaries"].replace_one({"_id": SUMMARY_ID}, summary, upsert=True)
+
+        # Backfill the per-student total used for filtering on documents written before it existed
+        await db.get_async_db()["students"].update_many(
+            {"total_solved": {"$exists": False}},
+            [{"$set": {"total_solved": total_expr}}]
+        )
+        return summary
+
+    @staticmethod
+    async def get():
+        summary = await db.get_async_db()["summaries"].find_one({"_id": SUMMARY_ID})
+        if summary is None:
+            summary = await DashboardSummary.rebuild()
+        return summary
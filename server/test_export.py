@@ -1,5 +1,7 @@
-from services.export import ExportService
+from services.export import ExportRenderer
 from database import db
+import asyncio
+import os
 import sys
 
 try:
@@ -7,14 +9,15 @@ try:
     db.connect()
     print("Testing generate_excel...")
     # Test contest mode
-    output = ExportService.generate_excel(
+    path = asyncio.run(ExportRenderer.generate_excel(
         department="CSE", 
         year=None, 
         platform="Codeforces", 
         contest_name="Test Contest", 
         contest_date="2025-01-01"
-    )
-    print("Success! Output size:", len(output.getvalue()))
+    ))
+    print("Success! Output size:", os.path.getsize(path))
+    os.remove(path)
 except Exception as e:
     print("Error occurred:")
     import traceback
@@ -0,0 +1,44 @@
+"""
+Standalone refresh worker. Leases jobs from `refresh_jobs` until interrupted;
+start as many as needed, on any node that can reach MongoDB.
+
+    python worker.py [concurrency]
+
+Platform rate limits are enforced per process. With several workers (plus the
+API processes), set RATE_LIMIT_PROCESSES to the total number of processes on
+every one of them, so each paces itself at its share of the platform's budget
+(see services/rate_limit.py).
+"""
+import asyncio
+import signal
+import sys
+from database import db
+from indexes import ensure_indexes
+from services.cache import response_cache
+from services.executors import executors
+from services.http_client import http_clients
+from services.jobs import RefreshWorker, WORKER_CONCURRENCY
+
+async def main(concurrency: int):
+    worker = RefreshWorker(concurrency=concurrency)
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, lambda: asyncio.create_task(worker.stop()))
+
+    await http_clients.start()
+    try:
+        await worker.run()
+    finally:
+        await http_clients.close()
+        await db.close_async()
+    print(f"Refresh worker {worker.worker_id} stopped")
+
+if __name__ == "__main__":
+    db.connect()
+    ensure_indexes()
+    response_cache.setup()
+    try:
+        asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else WORKER_CONCURRENCY))
+    finally:
+        db.close()
+        executors.shutdown()